@@ -12,5 +12,16 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'WolvenfestFitness.settings')
+os.environ.setdefault('WOLF_ASYNC_VIEWS', '1') # Async chat/logging views only pay off here; WSGI and runserver keep the sync ones
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from my_app.chat import websocket_application  # noqa: E402 - needs the app registry loaded above
+
+
+async def application(scope, receive, send):
+    # Pack chat sockets are handled by my_app.chat, everything else by Django
+    if scope['type'] == 'websocket':
+        await websocket_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
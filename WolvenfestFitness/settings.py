@@ -12,6 +12,9 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
+
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'my_app.middleware.InstrumentationMiddleware', # Outermost, so its timings cover the whole stack
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,7 +62,6 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / "templates"],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -66,6 +69,12 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            'loaders': [ # Parse each template once per process; runserver's autoreloader clears the cache on edits
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
@@ -76,12 +85,72 @@ WSGI_APPLICATION = 'WolvenfestFitness.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# WOLF_DB_PROFILE picks the database profile: "sqlite" (default) or "postgres".
+
+DB_PROFILE = os.environ.get('WOLF_DB_PROFILE', 'sqlite')
+
+if DB_PROFILE == 'postgres':
+    DB_POOL = os.environ.get('WOLF_DB_POOL', '0') == '1' # psycopg connection pool (needs psycopg[pool])
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('PGDATABASE', 'wolvenfest'),
+            'USER': os.environ.get('PGUSER', 'wolvenfest'),
+            'PASSWORD': os.environ.get('PGPASSWORD', ''),
+            'HOST': os.environ.get('PGHOST', '127.0.0.1'),
+            'PORT': os.environ.get('PGPORT', '5432'),
+            # Persistent connections, unless the pool is managing them (Django requires CONN_MAX_AGE=0 with a pool)
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('WOLF_DB_CONN_MAX_AGE', '600')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {'pool': {'min_size': 2, 'max_size': int(os.environ.get('WOLF_DB_POOL_SIZE', '10'))}} if DB_POOL else {},
+        }
     }
-}
+elif DB_PROFILE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                'timeout': 20, # Seconds a writer waits for the lock before "database is locked"
+                'transaction_mode': 'IMMEDIATE', # Take the write lock at BEGIN instead of failing on upgrade mid-transaction
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;' # Readers no longer block the writer (and vice versa)
+                    'PRAGMA synchronous=NORMAL;' # Safe with WAL, fsyncs at checkpoints instead of every commit
+                    'PRAGMA mmap_size=134217728;' # Read through a 128 MB memory map
+                    'PRAGMA temp_store=MEMORY;'
+                ),
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"Unknown WOLF_DB_PROFILE {DB_PROFILE!r}; use 'sqlite' or 'postgres'.")
+
+# WOLF_REPLICA_DB adds a read replica: a file path for SQLite (refresh it with `python manage.py sync_replica`) or
+# the replica's host for PostgreSQL. Views marked @replica_reads read from it (see my_app/routers.py).
+REPLICA_DB = os.environ.get('WOLF_REPLICA_DB', '')
+REPLICA_STICKY_SECONDS = 10 # After a write, that client reads from the primary this long; keep it above replication lag
+
+if REPLICA_DB:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME' if DB_PROFILE == 'sqlite' else 'HOST': REPLICA_DB,
+        'TEST': {'MIRROR': 'default'}, # Tests read the test database through both aliases
+    }
+    DATABASE_ROUTERS = ['my_app.routers.PrimaryReplicaRouter']
+    MIDDLEWARE.insert(1, 'my_app.middleware.ReplicaStickinessMiddleware') # Outside sessions, so session writes count too
+
+
+# Cache
+# LocMemCache is per process, so it only suits a single worker; set WOLF_CACHE_URL (e.g. redis://127.0.0.1:6379/1)
+# or WOLF_CACHE_DIR to share per-user fragments between workers.
+if os.environ.get('WOLF_CACHE_URL'):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': os.environ['WOLF_CACHE_URL']}}
+elif os.environ.get('WOLF_CACHE_DIR'):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': os.environ['WOLF_CACHE_DIR']}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'wolvenfest'}}
+
+FRAGMENT_CACHE_SECONDS = 24 * 60 * 60 # Per-user page fragments; bumping the user's data generation invalidates them sooner
 
 
 # Password validation
@@ -123,10 +192,52 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles') # `python manage.py build_assets` collects hashed, pre-compressed files here
+STATIC_BUILD_DIR = os.path.join(BASE_DIR, 'static_build') # Generated image variants, collected alongside static/
+if os.path.isdir(STATIC_BUILD_DIR):
+    STATICFILES_DIRS.append(STATIC_BUILD_DIR)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'my_app.storage.CompressedManifestStaticFilesStorage'},
+}
+SERVE_STATIC = os.environ.get('WOLF_SERVE_STATIC', '1') == '1' # Serve STATIC_ROOT (when DEBUG is off) and MEDIA_ROOT from Django when no web server fronts them
+RESPONSIVE_IMAGE_WIDTHS = [480, 960, 1440] # Variant widths generated for {% responsive_image %}
+
+# Profile pictures (my_app/avatars.py), rendered by the avatar_uploaded task
+AVATAR_SIZES = [48, 128, 256] # Square thumbnail sizes in pixels; the first is used in chat and leaderboards
+AVATAR_MAX_BYTES = 10 * 1024 * 1024 # Larger uploads are rejected while streaming
+AVATAR_MAX_PIXELS = 40_000_000 # Guards the decode against decompression bombs
+AVATAR_PROCESSES = 2 # Process pool size for thumbnail rendering, per worker
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-LOGIN_URL = 'login' # URL to redirect to for login
\ No newline at end of file
+LOGIN_URL = 'login' # URL to redirect to for login
+
+DASHBOARD_PAGE_SIZE = 20 # Number of workouts/meals per dashboard feed page
+LEADERBOARD_SIZE = 10 # Members shown per leaderboard
+GROUP_PAGE_SIZE = 24 # Packs per pack directory page
+
+# Background tasks (my_app/tasks.py), run by `python manage.py run_task_worker`
+# Run tasks inline instead of queueing them (no worker needed). On by default with the per-process cache, which a worker
+# can't invalidate (see my_app/checks.py)
+TASKS_EAGER = os.environ.get('WOLF_TASKS_EAGER', '1' if CACHES['default']['BACKEND'].endswith('LocMemCache') else '0') == '1'
+TASK_LEASE_SECONDS = 5 * 60 # A running task older than this is assumed abandoned and handed to another worker
+TASK_RETRY_SECONDS = 5 # First retry delay; doubles with every attempt
+TASK_RETENTION_SECONDS = 24 * 60 * 60 # How long finished tasks (and their idempotency keys) are kept
+
+CHAT_BROKER = 'my_app.chat.InMemoryBroker' # Pub/sub backend for live pack chat (single-process fan-out)
+ASYNC_VIEWS = os.environ.get('WOLF_ASYNC_VIEWS', '0') == '1' # Route chat/logging pages to my_app/async_views.py; asgi.py turns it on
+CHAT_HISTORY_LIMIT = 50 # Messages rendered on a pack page and returned per polling request
+MESSAGE_ARCHIVE_DAYS = 90 # `python manage.py archive_messages` moves older chat into compressed monthly archives
+METRICS_SAMPLE_RATE = float(os.environ.get('WOLF_METRICS_SAMPLE_RATE', '0.05')) # Share of requests instrumented (0 disables, 1 for local profiling)
+N_PLUS_ONE_THRESHOLD = 5 # Same SQL shape this many times in one request is reported as a likely N+1
+TEMPLATE_PROFILING = os.environ.get('WOLF_TEMPLATE_PROFILING', '0') == '1' # Time templates/blocks/includes in sampled requests (patches Django's template classes, so opt-in)
+TEMPLATE_SLOW_SECONDS = 0.05 # Renders slower than this log their slowest templates and blocks
+TEMPLATE_REPORT_LIMIT = 5 # Entries in that log line and in the DEBUG Server-Timing header
+# Besides staff users, /metrics/ only answers scrapers sending 'Authorization: Bearer <token>'. There is no IP allowlist,
+# since behind a reverse proxy every client would share the proxy's address.
+METRICS_TOKEN = os.environ.get('WOLF_METRICS_TOKEN', '') # Empty: staff only
+ANALYTICS_CACHE_SECONDS = 60 * 60 # Analytics are also invalidated whenever the user logs or deletes something
\ No newline at end of file
@@ -15,13 +15,18 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+from my_app.assets import serve_media, serve_static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('my_app.urls')),
     path('accounts/', include('django.contrib.auth.urls')),
     path('groups/', include('my_app.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)  # Serve media files in development
+]
+
+if settings.SERVE_STATIC: # Without a web server in front; runserver serves static itself in DEBUG
+    urlpatterns.append(re_path(rf'^{settings.MEDIA_URL.strip("/")}/(?P<path>.+)$', serve_media))
+    if not settings.DEBUG:
+        urlpatterns.append(re_path(rf'^{settings.STATIC_URL.strip("/")}/(?P<path>.+)$', serve_static))
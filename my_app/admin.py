@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserProfile, Workout, MealLog, Challenge, Badge, UserBadge
+from .models import UserProfile, Workout, MealLog, Challenge, Badge, UserBadge, BadgeProgress, DailySummary, LeaderboardEntry, Task, Avatar, MessageArchive
 
 # Register your models here.
 
@@ -7,4 +7,10 @@ admin.site.register(UserProfile) # This is the user profile model, which extends
 admin.site.register(Workout) # This is the workout model, which tracks user workouts.
 admin.site.register(MealLog) # This is the meal log model, which tracks user meals.
 admin.site.register(Badge) # This is the badge model, which represents badges that users can earn.
-admin.site.register(UserBadge) # This is the user badge model, which tracks which badges a user has earned.
\ No newline at end of file
+admin.site.register(UserBadge) # This is the user badge model, which tracks which badges a user has earned.
+admin.site.register(BadgeProgress) # This is the running counter state the badge engine awards badges from.
+admin.site.register(DailySummary) # This is the per-day rollup of workouts and meals used by the routine page.
+admin.site.register(LeaderboardEntry) # This is the materialized per-period totals the leaderboards rank.
+admin.site.register(Task) # This is the background task queue the run_task_worker command drains.
+admin.site.register(Avatar) # This is the processed profile picture, shared by every upload with the same content.
+admin.site.register(MessageArchive) # This is one pack-month of compressed chat history moved out of the message table.
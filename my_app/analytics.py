@@ -0,0 +1,101 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .caching import cached_for_user
+from .models import DailySummary, Workout
+
+try: # NumPy is optional; rolling windows fall back to a pure-Python running sum without it
+    import numpy as np
+except ImportError:
+    np = None
+
+PERIODS = {'week': TruncWeek, 'month': TruncMonth}
+
+############################## Bucketing ##############################
+def _period_start(day, period): # Same truncation the database applies
+    return day - timedelta(days=day.weekday()) if period == 'week' else day.replace(day=1)
+
+def _next_period(day, period):
+    if period == 'week':
+        return day + timedelta(days=7)
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def _buckets(start, end, period): # Every bucket in the range, so empty weeks/months count as zeros
+    bucket = _period_start(start, period)
+    while bucket <= end:
+        yield bucket
+        bucket = _next_period(bucket, period)
+
+############################## Aggregation ##############################
+def rolling_average(values, window): # Trailing mean; None until a full window is available
+    if window <= 1 or not values:
+        return [float(value) for value in values]
+    if len(values) < window: # np.convolve would swap its operands and return window - len(values) + 1 means
+        return [None] * len(values)
+    if np is not None:
+        means = np.convolve(np.asarray(values, dtype=float), np.ones(window) / window, mode='valid')
+        return [None] * (window - 1) + [round(float(mean), 1) for mean in means]
+
+    averages, total = [], 0
+    for i, value in enumerate(values):
+        total += value
+        if i >= window:
+            total -= values[i - window]
+        averages.append(round(total / window, 1) if i >= window - 1 else None)
+    return averages
+
+def calorie_trends(user, period, start, end): # Summed from the DailySummary rollup, one bucket per week/month
+    rows = (
+        DailySummary.objects.filter(user=user, date__gte=start, date__lte=end)
+        .annotate(bucket=PERIODS[period]('date'))
+        .values('bucket')
+        .annotate(calories_in=Sum('calories_in'), calories_burned=Sum('calories_burned'), workouts=Sum('workout_count'))
+        .order_by('bucket')
+    )
+    totals = {row['bucket']: row for row in rows}
+    trends = []
+    for bucket in _buckets(start, end, period):
+        row = totals.get(bucket, {})
+        calories_in, calories_burned = row.get('calories_in') or 0, row.get('calories_burned') or 0
+        trends.append({
+            'period_start': bucket.isoformat(),
+            'calories_in': calories_in,
+            'calories_burned': calories_burned,
+            'net': calories_in - calories_burned,
+            'workouts': row.get('workouts') or 0,
+        })
+    return trends
+
+def workout_breakdown(user, start, end):
+    return list(
+        Workout.objects.filter(user=user, date__gte=start, date__lte=end)
+        .values('workout_type')
+        .annotate(workouts=Count('id'), minutes=Sum('duration'), calories_burned=Sum('calories_burned'))
+        .order_by('-calories_burned')
+    )
+
+############################## Cached Entry Point ##############################
+def user_analytics(user, period='week', window=4, days=365): # Cached until the user's data generation changes
+    def build():
+        end = timezone.now().date()
+        start = end - timedelta(days=days - 1)
+        trends = calorie_trends(user, period, start, end)
+        for name, series in (('calories_in', 'avg_calories_in'), ('calories_burned', 'avg_calories_burned'), ('net', 'avg_net')):
+            for trend, average in zip(trends, rolling_average([trend[name] for trend in trends], window)):
+                trend[series] = average
+        return {
+            'period': period,
+            'window': window,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'trends': trends,
+            'workout_types': workout_breakdown(user, start, end),
+        }
+
+    # The window ends today, so the date is part of the key as well
+    name = f"analytics:{timezone.now().date()}:{period}:{window}:{days}"
+    return cached_for_user(user.id, name, build, settings.ANALYTICS_CACHE_SECONDS)
@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class MyAppConfig(AppConfig): # This is the configuration class for the app.
@@ -6,4 +7,8 @@ class MyAppConfig(AppConfig): # This is the configuration class for the app.
     name = 'my_app'
 
     def ready(self): # This method is called when the app is ready.
-        import my_app.signals
\ No newline at end of file
+        import my_app.checks
+        import my_app.signals
+        if settings.TEMPLATE_PROFILING:
+            from my_app import render_profiler
+            render_profiler.install()
\ No newline at end of file
@@ -0,0 +1,124 @@
+import json
+import zlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.functions import TruncMonth
+
+from .models import Message, MessageArchive
+
+# Chat older than settings.MESSAGE_ARCHIVE_DAYS lives in MessageArchive rows instead of Message, so the hot table only
+# holds recent chat and its (group, timestamp) index stays small. Each row is one pack-month of NDJSON lines
+# {"id", "user_id", "content", "timestamp"} in chat order, zlib-compressed. Authors are resolved when the archive is
+# read, so renamed users and new avatars show up as they do in live chat.
+
+ARCHIVE_CACHE_SIZE = 16 # Decompressed pack-months kept per process for "load older" paging
+
+############################## Encoding ##############################
+def _pack(lines): # [(id, user_id, content, timestamp ISO string)] -> compressed NDJSON
+    text = "".join(
+        json.dumps({'id': id, 'user_id': user_id, 'content': content, 'timestamp': timestamp}, ensure_ascii=False) + "\n"
+        for id, user_id, content, timestamp in lines
+    )
+    return zlib.compress(text.encode('utf-8'), 9) # Written once, read many times: decompression speed doesn't depend on the level
+
+def _unpack(data):
+    return [
+        (record['id'], record['user_id'], record['content'], record['timestamp'])
+        for record in map(json.loads, zlib.decompress(bytes(data)).decode('utf-8').splitlines())
+    ]
+
+def _timestamp(value): # Fixed-width UTC, so the strings sort in time order
+    return value.astimezone(dt_timezone.utc).isoformat(timespec='microseconds')
+
+@lru_cache(maxsize=ARCHIVE_CACHE_SIZE)
+def _archive_lines(archive_id, updated_at): # Keyed on updated_at, so a rewritten month is never served stale
+    return tuple(_unpack(MessageArchive.objects.values_list('data', flat=True).get(pk=archive_id)))
+
+############################## Archiving ##############################
+def _write(group_id, month, lines): # Replace one pack-month's blob; an empty month loses its row
+    if not lines:
+        MessageArchive.objects.filter(group_id=group_id, month=month).delete()
+        return
+    archive, _ = MessageArchive.objects.update_or_create(group_id=group_id, month=month, defaults={
+        'first_id': min(line[0] for line in lines),
+        'last_id': max(line[0] for line in lines),
+        'message_count': len(lines),
+        'data': _pack(lines),
+    })
+    archive.authors.set({line[1] for line in lines})
+
+def archive_month(group_id, start, end): # Move one pack's messages in [start, end) into its month's archive
+    with transaction.atomic():
+        messages = Message.objects.filter(group_id=group_id, timestamp__gte=start, timestamp__lt=end)
+        rows = [
+            (id, user_id, content, _timestamp(timestamp))
+            for id, user_id, content, timestamp in messages.order_by('timestamp', 'id').values_list('id', 'user_id', 'content', 'timestamp')
+        ]
+        if not rows:
+            return 0
+        month = start.date().replace(day=1)
+        existing = MessageArchive.objects.select_for_update().filter(group_id=group_id, month=month).values_list('data', flat=True).first()
+        lines = _unpack(existing) if existing is not None else []
+        _write(group_id, month, sorted(lines + rows, key=lambda line: (line[3], line[0])))
+        messages.filter(id__lte=max(row[0] for row in rows)).delete() # Exactly the rows read above
+    return len(rows)
+
+def archive_messages(cutoff): # Archive every message older than cutoff; returns (messages moved, pack-months written)
+    months = (
+        Message.objects.filter(timestamp__lt=cutoff)
+        .annotate(month=TruncMonth('timestamp', tzinfo=dt_timezone.utc))
+        .values_list('group_id', 'month').distinct().order_by('month', 'group_id')
+    )
+    moved = written = 0
+    for group_id, start in list(months):
+        end = min((start + timedelta(days=32)).replace(day=1), cutoff) # The cutoff month is archived up to the cutoff
+        count = archive_month(group_id, start, end)
+        moved += count
+        written += bool(count)
+    return moved, written
+
+def remove_author(user_id, archive_ids): # Drop a deleted account's lines, as the CASCADE does for Message rows
+    for archive in MessageArchive.objects.filter(pk__in=archive_ids).only('group_id', 'month'):
+        with transaction.atomic():
+            data = MessageArchive.objects.select_for_update().filter(pk=archive.pk).values_list('data', flat=True).first()
+            if data is not None:
+                _write(archive.group_id, archive.month, [line for line in _unpack(data) if line[1] != user_id])
+
+############################## Reading ##############################
+def _messages(group_id, lines): # Unsaved Message objects with their authors attached (deleted authors are skipped)
+    users = get_user_model().objects.select_related('profile__avatar').in_bulk({line[1] for line in lines})
+    messages = []
+    for id, user_id, content, timestamp in lines:
+        if user_id in users:
+            message = Message(id=id, group_id=group_id, user=users[user_id], content=content, timestamp=datetime.fromisoformat(timestamp))
+            messages.append(message)
+    return messages
+
+def messages_before(group_id, before_id, limit): # ([up to `limit` messages older than before_id, oldest first], has_more)
+    hot = Message.objects.filter(group_id=group_id, id__lt=before_id).select_related('user__profile__avatar').order_by('-timestamp', '-id')
+    page = list(hot[:limit + 1])
+    if len(page) > limit:
+        return page[:limit][::-1], True
+
+    older = [] # Archived lines, newest first, until the page is full
+    archives = MessageArchive.objects.filter(group_id=group_id, first_id__lt=before_id).order_by('-month').values_list('id', 'updated_at')
+    has_more = False
+    for archive_id, updated_at in archives.iterator():
+        if len(page) + len(older) >= limit:
+            has_more = True
+            break
+        lines = [line for line in _archive_lines(archive_id, updated_at) if line[0] < before_id]
+        older += lines[::-1][:limit - len(page) - len(older) + 1]
+        if len(page) + len(older) > limit:
+            has_more = True
+            break
+    return _messages(group_id, older[:limit - len(page)])[::-1] + page[::-1], has_more
+
+def user_rows(user): # (group name, content, timestamp) of the user's archived messages, month by month, for exports
+    for archive in MessageArchive.objects.filter(authors=user).select_related('group').only('group__name', 'updated_at').order_by('month', 'id'):
+        for _, user_id, content, timestamp in _archive_lines(archive.id, archive.updated_at):
+            if user_id == user.id:
+                yield archive.group.name, content, datetime.fromisoformat(timestamp)
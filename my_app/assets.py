@@ -0,0 +1,155 @@
+import json
+import mimetypes
+import os
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from PIL import Image, ImageOps
+
+from .avatars import AVATAR_DIR
+
+RESPONSIVE_MANIFEST = 'responsive.json' # Written into STATIC_BUILD_DIR: source image -> its variants
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=0, must-revalidate' # Unhashed names can change content, so always check the ETag
+
+############################## Responsive Variants ##############################
+def build_image_variants(widths, source_dirs=None, out_dir=None): # Returns the manifest written to out_dir
+    out_dir = Path(out_dir or settings.STATIC_BUILD_DIR)
+    manifest = {}
+    for source_dir in source_dirs or settings.STATICFILES_DIRS:
+        source_dir = Path(source_dir)
+        if source_dir.resolve() == out_dir.resolve():
+            continue
+        for source in sorted(source_dir.rglob('*')):
+            if source.suffix.lower() not in IMAGE_EXTENSIONS:
+                continue
+            name = source.relative_to(source_dir).as_posix()
+            with Image.open(source) as opened:
+                image = ImageOps.exif_transpose(opened).convert('RGB') # Bake in rotation; the copies carry no EXIF
+            entry = {'width': image.width, 'height': image.height, 'webp': [], 'jpeg': []}
+            for width in sorted({min(width, image.width) for width in widths}):
+                resized = image if width == image.width else image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+                stem = f"{os.path.splitext(name)[0]}-{width}w"
+                for fmt, extension, options in (('webp', '.webp', {'quality': 78, 'method': 6}), ('jpeg', '.jpg', {'quality': 80, 'optimize': True, 'progressive': True})):
+                    target = out_dir / (stem + extension)
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    resized.save(target, fmt.upper(), **options)
+                    entry[fmt].append([stem + extension, width])
+            manifest[name] = entry
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / RESPONSIVE_MANIFEST).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    return manifest
+
+_loaded = {'mtime': None, 'variants': {}}
+
+def responsive_variants(name): # Variant entry for a static image, or None before build_assets has run
+    path = finders.find(RESPONSIVE_MANIFEST) if settings.DEBUG else os.path.join(settings.STATIC_ROOT, RESPONSIVE_MANIFEST)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except (OSError, TypeError):
+        return None
+    if mtime != _loaded['mtime']: # Reloaded after a rebuild without restarting the server
+        with open(path, encoding='utf-8') as handle:
+            _loaded['variants'] = json.load(handle)
+        _loaded['mtime'] = mtime
+    return _loaded['variants'].get(name)
+
+############################## Serving ##############################
+@lru_cache(maxsize=1)
+def _immutable_names(): # Content-hashed names from the collectstatic manifest (loaded once per process)
+    return frozenset(staticfiles_storage.hashed_files.values())
+
+def _byte_range(header, size): # (start, end) inclusive for a single "bytes=" range, None to send it all, or False if unsatisfiable
+    units, _, spec = header.partition('=')
+    if units.strip() != 'bytes' or ',' in spec: # Multipart ranges aren't worth supporting for images and CSS
+        return None
+    first, _, last = spec.strip().partition('-')
+    try:
+        if first:
+            start, end = int(first), int(last) if last else size - 1
+        else: # "bytes=-500": the last 500 bytes
+            start, end = max(size - int(last), 0), size - 1
+    except ValueError:
+        return None
+    if first and last and start > end: # Invalid rather than unsatisfiable: ignored, so the whole file is sent (RFC 9110 14.2)
+        return None
+    if start >= size:
+        return False
+    return start, min(end, size - 1)
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as handle:
+        handle.seek(start)
+        while length > 0:
+            chunk = handle.read(min(length, 64 * 1024))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+def serve_file(request, full_path, cache_control, encodings=False):
+    # One file with ETag/Last-Modified revalidation and single-range requests; with encodings, a .br/.gz sibling
+    # is sent instead when the client accepts it
+    if not os.path.isfile(full_path):
+        raise Http404("Not found")
+    body_path, encoding = full_path, None
+    if encodings:
+        accepted = request.headers.get('Accept-Encoding', '')
+        for suffix, name in (('.br', 'br'), ('.gz', 'gzip')):
+            if name in accepted and os.path.isfile(full_path + suffix):
+                body_path, encoding = full_path + suffix, name
+                break
+
+    stat = os.stat(body_path)
+    etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}{"-" + encoding if encoding else ""}"'
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+        byte_range = None
+        if request.headers.get('Range') and request.headers.get('If-Range', etag) in (etag, http_date(stat.st_mtime)):
+            byte_range = _byte_range(request.headers['Range'], stat.st_size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f"bytes */{stat.st_size}"
+        elif byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(_read_range(body_path, start, end - start + 1), status=206, content_type=content_type)
+            response['Content-Range'] = f"bytes {start}-{end}/{stat.st_size}"
+            response['Content-Length'] = str(end - start + 1)
+        else:
+            response = FileResponse(open(body_path, 'rb'), content_type=content_type, filename=os.path.basename(full_path))
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = cache_control
+    if encodings:
+        response['Vary'] = 'Accept-Encoding'
+    return response
+
+def _safe_path(root, path):
+    try:
+        return safe_join(root, path)
+    except SuspiciousFileOperation:
+        raise Http404("Not found")
+
+def serve_static(request, path): # STATIC_ROOT, pre-compressed where possible, caching hashed names forever
+    cache_control = IMMUTABLE if path in _immutable_names() else REVALIDATE
+    return serve_file(request, _safe_path(settings.STATIC_ROOT, path), cache_control, encodings=True)
+
+def serve_media(request, path): # Avatar thumbnails only, named by content hash so they never change
+    # Raw uploads (incoming/) and legacy profile_pics/ originals still carry their EXIF, so nothing else is served
+    directory, _, name = path.partition('/')
+    if directory != AVATAR_DIR or not name:
+        raise Http404("Not found")
+    return serve_file(request, _safe_path(os.path.join(settings.MEDIA_ROOT, AVATAR_DIR), name), IMMUTABLE)
@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponseForbidden
+from django.shortcuts import aget_object_or_404, redirect, render
+
+from .chat import apost_message
+from .forms import MealLogForm, WorkoutLogForm
+from .models import Group, Message, MessageArchive, Profile
+
+# Async versions of the chat and logging views, routed in urls.py when settings.ASYNC_VIEWS is on. Under ASGI they
+# wait on the database without holding a worker thread for the whole request; the sync versions in views.py are
+# used otherwise and behave the same.
+
+async def _user(request): # Resolve the user with the async auth API and reuse it for templates
+    request.user = await request.auser() # Otherwise the lazy request.user would query synchronously during render
+    return request.user
+
+################################## Fitness Tracking #############################
+@login_required
+async def log_workout(request):
+    user = await _user(request)
+    if request.method == "POST":
+        weight = None
+        if not request.POST.get('calories_burned'): # Only the calorie estimate needs the profile weight
+            weight = await Profile.objects.filter(user=user).values_list('weight', flat=True).afirst()
+        form = WorkoutLogForm(request.POST, weight_kg=weight)
+        if form.is_valid(): # If the form is valid, save the workout
+            workout = form.save(commit=False)
+            workout.user = user
+            await workout.asave()
+            return redirect('dashboard')
+    else:
+        form = WorkoutLogForm()
+
+    return render(request, 'logs/log_workout.html', {'form': form})
+
+@login_required
+async def log_meal(request):
+    user = await _user(request)
+    if request.method == "POST":
+        form = MealLogForm(request.POST)
+        if form.is_valid(): # If the form is valid, save the meal
+            meal = form.save(commit=False)
+            meal.user = user
+            await meal.asave()
+            return redirect('dashboard')
+    else:
+        form = MealLogForm()
+
+    return render(request, 'logs/log_meal.html', {'form': form})
+
+########################### Group Management #######################################
+@login_required
+async def group_detail(request, group_id): # View group details and messages
+    user = await _user(request)
+    group = await aget_object_or_404(Group, id=group_id)
+    is_member = await group.members.filter(pk=user.pk).aexists() # One lookup on the membership index
+
+    if request.method == 'POST':
+        if not is_member: # Posts are pushed live to the pack, so only members may send them
+            return HttpResponseForbidden("Join this pack to howl in it.")
+        content = request.POST.get('message')
+        if content:
+            await apost_message(group.id, user, content) # Saves and pushes to connected pack members
+            return redirect('group_detail', group_id=group.id)
+
+    messages, has_older = [], False
+    if is_member: # Only members see the chat, and only the latest messages are rendered
+        latest = Message.objects.filter(group=group).select_related('user__profile__avatar').order_by('-timestamp', '-id')
+        messages = [message async for message in latest[:settings.CHAT_HISTORY_LIMIT]][::-1]
+        has_older = len(messages) == settings.CHAT_HISTORY_LIMIT or await MessageArchive.objects.filter(group=group).aexists()
+
+    return render(request, 'groups/group_detail.html', {
+        'group': group,
+        'is_member': is_member,
+        'messages': messages,
+        'has_older': has_older,
+    })
+
+@login_required
+async def join_group(request, group_id):
+    user = await _user(request)
+    group = await aget_object_or_404(Group, id=group_id)
+    await group.members.aadd(user) # The membership signal queues the badge progress update
+
+    return redirect('group_detail', group_id=group.id)
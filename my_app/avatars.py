@@ -0,0 +1,111 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from . import imaging, tasks
+from .models import Avatar, Profile
+
+# Profile picture pipeline: the request streams the upload to disk while hashing it and queues an
+# `avatar_uploaded` task; the task renders the thumbnails in a process pool (Pillow work is CPU-bound and
+# would otherwise hold the GIL in the worker's threads) and attaches the result to the profile.
+
+AVATAR_DIR = 'avatars' # Under MEDIA_ROOT; content-addressed, so served with immutable caching
+INCOMING_DIR = 'incoming' # Under MEDIA_ROOT; never served
+CHUNK_SIZE = 64 * 1024
+
+def thumbnail_name(sha256, size):
+    return f"{AVATAR_DIR}/{sha256[:2]}/{sha256}-{size}.webp"
+
+def thumbnail_url(sha256, size=None): # None when the user has no picture
+    if not sha256:
+        return None
+    return settings.MEDIA_URL + thumbnail_name(sha256, size or settings.AVATAR_SIZES[0])
+
+def user_thumbnail(user, size=None): # Uses the loaded user.profile.avatar (select_related('user__profile__avatar'))
+    try:
+        avatar = user.profile.avatar
+    except Profile.DoesNotExist:
+        return None
+    return thumbnail_url(avatar.sha256, size) if avatar else None
+
+def thumbnail_for(user_id, size=None): # One query, for a single user outside a list
+    return thumbnail_url(Profile.objects.filter(user_id=user_id).values_list('avatar__sha256', flat=True).first(), size)
+
+async def athumbnail_for(user_id, size=None):
+    return thumbnail_url(await Profile.objects.filter(user_id=user_id).values_list('avatar__sha256', flat=True).afirst(), size)
+
+def incoming_path(sha256):
+    return os.path.join(settings.MEDIA_ROOT, INCOMING_DIR, f"{sha256}.upload")
+
+############################## Upload ##############################
+def save_upload(upload): # Stream to disk in chunks, hashing as we go; returns the SHA-256 (ValueError if too big)
+    directory = os.path.join(settings.MEDIA_ROOT, INCOMING_DIR)
+    os.makedirs(directory, exist_ok=True)
+    partial = os.path.join(directory, f"{uuid.uuid4().hex}.part")
+    digest, written = hashlib.sha256(), 0
+    try:
+        with open(partial, 'wb') as target:
+            for chunk in upload.chunks(CHUNK_SIZE):
+                written += len(chunk)
+                if written > settings.AVATAR_MAX_BYTES:
+                    raise ValueError(f"Pictures can be at most {settings.AVATAR_MAX_BYTES // (1024 * 1024)} MB.")
+                digest.update(chunk)
+                target.write(chunk)
+        sha256 = digest.hexdigest()
+        imaging.probe(partial, settings.AVATAR_MAX_PIXELS) # Header only; the full decode happens in the pool
+        os.replace(partial, incoming_path(sha256))
+        return sha256
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+def set_avatar(user, upload): # Returns True if the picture is already live, False if it is still being processed
+    sha256 = save_upload(upload)
+    avatar = Avatar.objects.filter(sha256=sha256).first()
+    if avatar is not None: # Someone uploaded the same file before: reuse its thumbnails
+        Profile.objects.filter(user=user).update(avatar=avatar)
+        os.remove(incoming_path(sha256))
+        return True
+    tasks.enqueue('avatar_uploaded', key=f"avatar:{sha256}:{user.pk}", user_id=user.pk, sha256=sha256)
+    return Profile.objects.filter(user=user, avatar__sha256=sha256).exists() # With TASKS_EAGER it already ran
+
+############################## Processing ##############################
+_pool = None
+_pool_lock = threading.Lock()
+
+def pool(): # Spawned rather than forked: the worker and ASGI servers are multi-threaded
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.AVATAR_PROCESSES, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+def reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def process_avatar(user_id, sha256): # Render (once per content hash) and attach to the user's profile
+    avatar = Avatar.objects.filter(sha256=sha256).first()
+    source = incoming_path(sha256)
+    if avatar is None:
+        if not os.path.exists(source): # Nothing left to process (the upload was cleaned up)
+            return
+        out_dir = os.path.join(settings.MEDIA_ROOT, os.path.dirname(thumbnail_name(sha256, 0)))
+        try:
+            width, height = pool().submit(imaging.render_thumbnails, source, out_dir, sha256, settings.AVATAR_SIZES).result()
+        except BrokenProcessPool: # A worker process died (e.g. out of memory); start a fresh pool for the retry
+            reset_pool()
+            raise
+        avatar, _ = Avatar.objects.get_or_create(sha256=sha256, defaults={'width': width, 'height': height})
+    Profile.objects.filter(user_id=user_id).update(avatar=avatar)
+    if os.path.exists(source):
+        os.remove(source) # Only the stripped thumbnails are kept
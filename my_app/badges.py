@@ -0,0 +1,121 @@
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Badge, BadgeProgress, Group, UserBadge, Workout
+from .streaks import ActivityBitmap
+
+############################## Badge Rule Registry ##############################
+# Rules are plain predicates over a BadgeProgress row, so adding a badge never adds queries per request.
+BADGE_RULES = {} # Badge name -> BadgeRule, in registration order
+
+@dataclass(frozen=True)
+class BadgeRule:
+    name: str
+    description: str
+    emoji: str
+    check: Callable[[BadgeProgress], bool]
+
+def badge_rule(name, description, emoji): # Decorator registering a new badge rule
+    def register(check):
+        BADGE_RULES[name] = BadgeRule(name, description, emoji, check)
+        return check
+    return register
+
+@badge_rule("🔥 5-Day Streak", "Complete 5 days of workouts in a row.", "🔥")
+def five_day_streak(progress):
+    return progress.longest_streak >= 5
+
+@badge_rule("🌕 Full Moon Streak", "Complete 30 days of workouts in a row.", "🌕")
+def full_moon_streak(progress):
+    return progress.longest_streak >= 30
+
+@badge_rule("🌲 Trail Hunter", "Complete 10 total workouts.", "🌲")
+def trail_hunter(progress):
+    return progress.workout_count >= 10
+
+@badge_rule("🐾 Pack Leader", "Joined a wolf pack group!", "🐾")
+def pack_leader(progress):
+    return progress.group_count > 0
+
+
+############################## Badge Catalog Cache ##############################
+# Badge name -> id, loaded once per process and dropped by the Badge save/delete signals in signals.py.
+_catalog = None
+
+def badge_catalog():
+    global _catalog
+    if _catalog is None:
+        catalog = dict(Badge.objects.values_list('name', 'id'))
+        for name, rule in BADGE_RULES.items(): # Rules registered after the seed migration get their Badge row here
+            if name not in catalog:
+                catalog[name] = Badge.objects.create(name=rule.name, description=rule.description, emoji=rule.emoji).id
+        _catalog = catalog
+    return _catalog
+
+def invalidate_catalog():
+    global _catalog
+    _catalog = None
+
+
+############################## Progress Tracking ##############################
+def rebuild_progress(user_id): # Recompute a user's counters from their full history (backfills and first use only)
+    progress, _ = BadgeProgress.objects.select_for_update().get_or_create(user_id=user_id)
+    progress.workout_count = Workout.objects.filter(user_id=user_id).count()
+    progress.group_count = Group.members.through.objects.filter(user_id=user_id).count()
+    days = Workout.objects.filter(user_id=user_id).values_list('date', flat=True).distinct().iterator()
+    progress.activity_bitmap = ActivityBitmap.from_days(days)
+    progress.awarded = list(UserBadge.objects.filter(user_id=user_id).values_list('badge__name', flat=True).distinct())
+    return progress
+
+def _load_progress(user_id): # Returns (progress, rebuilt) with the row locked for the current transaction
+    progress = BadgeProgress.objects.select_for_update().filter(user_id=user_id).first()
+    if progress is None:
+        return rebuild_progress(user_id), True
+    return progress, False
+
+def award_badges(progress): # Award every newly satisfied rule; only touches the DB when something is earned
+    earned = [rule for name, rule in BADGE_RULES.items() if name not in progress.awarded and rule.check(progress)]
+    for rule in earned:
+        UserBadge.objects.create(user_id=progress.user_id, badge_id=badge_catalog()[rule.name])
+        progress.awarded.append(rule.name)
+    return earned
+
+def refresh_workout_day(user_id, day): # After workouts on `day` were added or removed; safe to repeat
+    with transaction.atomic():
+        progress, rebuilt = _load_progress(user_id)
+        if not rebuilt: # Recounted rather than incremented, so a retried or duplicated task can't double count
+            progress.workout_count = Workout.objects.filter(user_id=user_id).count()
+            bitmap = progress.activity_bitmap
+            if Workout.objects.filter(user_id=user_id, date=day).exists():
+                bitmap.add(day)
+            else:
+                bitmap.discard(day)
+            progress.activity_bitmap = bitmap
+        award_badges(progress)
+        progress.save()
+
+def record_group_change(user_id, group_count): # Called when the user joins or leaves packs
+    with transaction.atomic():
+        progress, _ = _load_progress(user_id)
+        progress.group_count = group_count
+        award_badges(progress)
+        progress.save()
+
+############################## Streak Display ##############################
+def streak_summary(user_id, window=30): # Current/longest streak and active days in the last `window` days
+    progress = BadgeProgress.objects.filter(user_id=user_id).first()
+    if progress is None:
+        with transaction.atomic():
+            progress = rebuild_progress(user_id)
+            progress.save()
+    bitmap, today = progress.activity_bitmap, timezone.localdate()
+    return {
+        'current': bitmap.current_streak(today),
+        'longest': bitmap.longest_streak(),
+        'active_days': bitmap.days_active(today - timedelta(days=window - 1), today),
+        'window': window,
+    }
@@ -0,0 +1,153 @@
+import json
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, reverse
+
+from . import urls as app_urls
+from .models import Group, MealLog, Message, Workout
+from .leaderboards import rebuild_leaderboards
+from .summaries import rebuild_daily_summaries
+from .utils import check_and_award_badges
+
+BASELINE_PATH = Path(__file__).with_name('benchmark_baseline.json')
+DEFAULT_SIZES = (10, 100, 1000)
+
+# Routes whose query count may legitimately differ between data sizes, with the allowed spread
+QUERY_GROWTH_ALLOWANCE = {
+    'group_detail': 1, # A short chat page also checks for archived months, a full one can skip that
+}
+
+############################## Synthetic Data ##############################
+@dataclass
+class SeedVolumes:
+    workouts: int
+    meals: int
+    groups: int
+    members: int # Extra members per group
+    messages: int # Per group
+
+    @classmethod
+    def for_size(cls, size): # One knob that scales every table together
+        return cls(workouts=size, meals=size, groups=max(1, size // 100), members=max(1, size // 10), messages=size)
+
+def seed_user(username, volumes): # A user with `volumes` worth of history, packs, pack mates and chat
+    User = get_user_model()
+    user = User.objects.create_user(username, password='benchmark-password')
+    today = date.today()
+
+    Workout.objects.bulk_create(
+        Workout(user=user, date=today - timedelta(days=i % 365), workout_type=f"Workout {i % 7}",
+                duration=30, calories_burned=200 + i % 100)
+        for i in range(volumes.workouts)
+    )
+    MealLog.objects.bulk_create(
+        MealLog(user=user, date=today - timedelta(days=i % 365), meal_name=f"Meal {i % 11}",
+                meal_type=('Breakfast', 'Lunch', 'Dinner', 'Snack')[i % 4], calories=300 + i % 200)
+        for i in range(volumes.meals)
+    )
+
+    mates = User.objects.bulk_create(User(username=f"{username}-mate-{i}") for i in range(volumes.members))
+    for g in range(volumes.groups):
+        group = Group.objects.create(name=f"{username} pack {g}", description="Benchmark pack")
+        group.members.add(user, *mates)
+        Message.objects.bulk_create(
+            Message(group=group, user=mates[i % len(mates)] if i % 2 else user, content=f"Howl {i}")
+            for i in range(volumes.messages)
+        )
+
+    rebuild_daily_summaries([user]) # bulk_create skips the signals that keep these current
+    rebuild_leaderboards([user])
+    check_and_award_badges(user)
+    return user
+
+############################## Route Driving ##############################
+def _route_names():
+    return [pattern.name for pattern in app_urls.urlpatterns if isinstance(pattern, URLPattern) and pattern.name]
+
+def _url_for(name, user): # Fill path arguments from the seeded user's own rows
+    pattern = next(p for p in app_urls.urlpatterns if isinstance(p, URLPattern) and p.name == name)
+    kwargs = {}
+    for arg in pattern.pattern.converters:
+        if arg == 'workout_id':
+            kwargs[arg] = Workout.objects.filter(user=user).values_list('id', flat=True).first()
+        elif arg == 'meal_id':
+            kwargs[arg] = MealLog.objects.filter(user=user).values_list('id', flat=True).first()
+        elif arg == 'group_id':
+            kwargs[arg] = user.custom_groups.values_list('id', flat=True).first()
+    return reverse(name, kwargs=kwargs)
+
+def bench_client(user): # Logged-in test client that also works outside the test runner's ALLOWED_HOSTS patching
+    client = Client(HTTP_HOST='localhost')
+    client.force_login(user)
+    return client
+
+def measure(client, url): # One cold-cache GET, rolled back so every route sees the same data
+    cache.clear()
+    tracemalloc.start()
+    with transaction.atomic():
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = client.get(url)
+            if response.streaming: # Streamed bodies only hit the database while being consumed
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - start
+        transaction.set_rollback(True)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'status': response.status_code,
+        'queries': len(queries),
+        'ms': round(elapsed * 1000, 2),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+# Routers are switched off: seeded rows only exist in the open transaction, which a read replica can't see.
+# Tasks are queued as in production, so each route is measured without the worker's share of the work
+@override_settings(DATABASE_ROUTERS=[], TASKS_EAGER=False)
+def run_benchmarks(sizes=DEFAULT_SIZES, routes=None): # {route: {size: measurement}}
+    results = {}
+    for size in sizes:
+        user = seed_user(f"bench-{size}-{time.time_ns()}", SeedVolumes.for_size(size))
+        client = bench_client(user)
+        for name in routes or _route_names():
+            results.setdefault(name, {})[size] = measure(client, _url_for(name, user))
+    return results
+
+############################## Checks ##############################
+def load_baseline(path=BASELINE_PATH):
+    return json.loads(Path(path).read_text()) if Path(path).exists() else {}
+
+def write_baseline(results, path=BASELINE_PATH): # Worst query count seen per route
+    baseline = {name: max(m['queries'] for m in by_size.values()) for name, by_size in sorted(results.items())}
+    Path(path).write_text(json.dumps(baseline, indent=4) + '\n')
+    return baseline
+
+def check_results(results, baseline): # Human-readable failures; empty when every route passes
+    failures = []
+    for name, by_size in results.items():
+        counts = [by_size[size]['queries'] for size in sorted(by_size)]
+        if max(counts) - min(counts) > QUERY_GROWTH_ALLOWANCE.get(name, 0):
+            failures.append(f"{name}: query count grows with data size {counts}")
+        if name in baseline and max(counts) > baseline[name]:
+            failures.append(f"{name}: {max(counts)} queries exceeds the baseline of {baseline[name]}")
+        errors = [by_size[size]['status'] for size in sorted(by_size) if by_size[size]['status'] >= 500]
+        if errors:
+            failures.append(f"{name}: server errors {errors}")
+    return failures
+
+def format_results(results):
+    sizes = sorted({size for by_size in results.values() for size in by_size})
+    lines = [f"{'route':<24}" + "".join(f"{f'n={size}':>30}" for size in sizes)]
+    for name, by_size in sorted(results.items()):
+        cells = [by_size[size] for size in sizes]
+        lines.append(f"{name:<24}" + "".join(f"{c['queries']:>6}q {c['ms']:>9.1f}ms {c['peak_kb']:>9.1f}KB" for c in cells))
+    return "\n".join(lines)
@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+############################## Per-User Data Generation ##############################
+# Every cached fragment for a user is keyed on their current "data generation". Signals bump it when the
+# user's workouts, meals or badges change, which orphans the old entries instead of deleting them one by one.
+def _generation_key(user_id):
+    return f"user:{user_id}:generation"
+
+def data_generation(user_id):
+    # Seeded with a timestamp so a generation lost to eviction never reuses a number that old entries were keyed on
+    return cache.get_or_set(_generation_key(user_id), time.time_ns(), timeout=None)
+
+def bump_generation(user_id):
+    try:
+        cache.incr(_generation_key(user_id))
+    except ValueError: # Nothing stored yet, so nothing cached can be stale
+        pass
+
+def cached_for_user(user_id, name, build, timeout=None): # Return the cached value for this generation, or build and store it
+    key = f"user:{user_id}:{data_generation(user_id)}:{name}"
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, settings.FRAGMENT_CACHE_SECONDS if timeout is None else timeout)
+    return value
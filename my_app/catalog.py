@@ -0,0 +1,152 @@
+import csv
+import re
+from bisect import bisect_left
+from dataclasses import dataclass
+from fractions import Fraction
+from functools import lru_cache
+from pathlib import Path
+
+# Bundled food and exercise catalog. Both lists are loaded once per process into sorted arrays searched with
+# bisect, so a typeahead lookup is a binary search plus a short scan and never touches the database.
+
+DATA_DIR = Path(__file__).resolve().parent / 'data'
+DEFAULT_WEIGHT_KG = 70 # Used for MET estimates when the profile has no weight
+
+@dataclass(frozen=True)
+class Food:
+    name: str
+    kcal_per_100g: float
+    serving_g: float # Grams in one "serving" / "piece" of this food
+
+@dataclass(frozen=True)
+class Exercise:
+    name: str
+    met: float # Metabolic equivalent: kcal burned per kg of body weight per hour
+
+def normalize(text): # Case- and spacing-insensitive key
+    return ' '.join(text.casefold().split())
+
+############################## Prefix Index ##############################
+class PrefixIndex:
+    def __init__(self, entries):
+        self.entries = list(entries)
+        self.by_name = {normalize(entry.name): entry for entry in self.entries}
+        names, words = [], []
+        for position, entry in enumerate(self.entries):
+            key = normalize(entry.name)
+            names.append((key, position))
+            for match in re.finditer(r'(?<=[\s(/-])\w', key): # Later words too, so "bre" finds "Chicken breast"
+                words.append((key[match.start():], position))
+        names.sort()
+        words.sort()
+        self._names = [key for key, _ in names] # Parallel arrays: bisect on plain strings, look up positions after
+        self._name_ids = [position for _, position in names]
+        self._words = [key for key, _ in words]
+        self._word_ids = [position for _, position in words]
+
+    def get(self, name): # Exact (normalized) name match, or None
+        return self.by_name.get(normalize(name))
+
+    def search(self, prefix, limit=10): # Names starting with the prefix first, then names with a word starting with it
+        prefix = normalize(prefix)
+        if not prefix or limit <= 0:
+            return []
+        found = []
+        seen = set()
+        for keys, ids in ((self._names, self._name_ids), (self._words, self._word_ids)):
+            for index in range(bisect_left(keys, prefix), len(keys)):
+                if not keys[index].startswith(prefix):
+                    break
+                position = ids[index]
+                if position not in seen:
+                    seen.add(position)
+                    found.append(self.entries[position])
+                    if len(found) == limit:
+                        return found
+        return found
+
+    def __len__(self):
+        return len(self.entries)
+
+def _read(filename, build):
+    with open(DATA_DIR / filename, newline='', encoding='utf-8') as handle:
+        return [build(row) for row in csv.DictReader(handle)]
+
+@lru_cache(maxsize=None)
+def food_index():
+    return PrefixIndex(_read('foods.csv', lambda row: Food(row['name'], float(row['kcal_per_100g']), float(row['serving_g']))))
+
+@lru_cache(maxsize=None)
+def exercise_index():
+    return PrefixIndex(_read('exercises.csv', lambda row: Exercise(row['name'], float(row['met']))))
+
+INDEXES = { # ?kind= value -> (index loader, typeahead detail)
+    'food': (food_index, lambda food: f"{food.kcal_per_100g:g} kcal/100g"),
+    'exercise': (exercise_index, lambda exercise: f"MET {exercise.met:g}"),
+}
+
+############################## Quantities ##############################
+UNIT_GRAMS = { # Household measures in grams; liquids are taken at 1 g/ml
+    'g': 1, 'gram': 1, 'kg': 1000, 'kilogram': 1000, 'mg': 0.001,
+    'oz': 28.35, 'ounce': 28.35, 'lb': 453.6, 'pound': 453.6,
+    'ml': 1, 'l': 1000, 'litre': 1000, 'liter': 1000,
+    'cup': 240, 'glass': 250, 'mug': 250, 'can': 330, 'bottle': 500,
+    'bowl': 300, 'plate': 350, 'handful': 30, 'slice': 30,
+    'tbsp': 15, 'tablespoon': 15, 'tsp': 5, 'teaspoon': 5,
+}
+PORTION_UNITS = {'', 'serving', 'portion', 'piece', 'pc', 'item', 'x', 'whole'} # Mean one serving of the food itself
+WORD_AMOUNTS = {'a': 1, 'an': 1, 'one': 1, 'half': Fraction(1, 2), 'quarter': Fraction(1, 4)}
+
+QUANTITY_RE = re.compile(
+    r'^(?P<amount>\d+\s+\d+/\d+|\d+/\d+|\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d*[.,]?\d+|a|an|one|half|quarter)?\s*(?:of\s+)?(?P<unit>[a-z]*)\.?(?:\s+of\b.*)?$'
+)
+THOUSANDS_RE = re.compile(r'^\d{1,3}(?:,\d{3})+(?:\.\d+)?$') # "1,000" and "12,500.5"; "1,5" is a decimal comma
+
+def _unit(word): # Singular form of a known unit, or None
+    for candidate in (word, word[:-1] if word.endswith('s') else None, word[:-2] if word.endswith('es') else None):
+        if candidate is not None and (candidate in UNIT_GRAMS or candidate in PORTION_UNITS):
+            return candidate
+    return None
+
+def parse_quantity(text): # "200g" -> (200, 'g'), "1 1/2 cups" -> (1.5, 'cup'), "a bowl" -> (1, 'bowl'); None if unreadable
+    match = QUANTITY_RE.match(normalize(text or ''))
+    if not match:
+        return None
+    unit = _unit(match['unit'])
+    if unit is None:
+        return None
+    amount = match['amount'] or '1'
+    try:
+        if amount in WORD_AMOUNTS:
+            value = WORD_AMOUNTS[amount]
+        elif ' ' in amount:
+            whole, part = amount.split()
+            value = int(whole) + Fraction(part)
+        elif THOUSANDS_RE.match(amount):
+            value = Fraction(amount.replace(',', ''))
+        else:
+            value = Fraction(amount.replace(',', '.'))
+    except ZeroDivisionError: # "1/0"
+        return None
+    return float(value), unit
+
+def quantity_grams(text, food): # Grams described by the quantity text, using the food's serving size for portions
+    parsed = parse_quantity(text)
+    if parsed is None:
+        return None
+    amount, unit = parsed
+    return amount * (food.serving_g if unit in PORTION_UNITS else UNIT_GRAMS[unit])
+
+############################## Calorie Estimates ##############################
+def estimate_meal_calories(meal_name, quantity): # Whole kcal, or None when the food or quantity isn't recognised
+    food = food_index().get(meal_name or '')
+    grams = quantity_grams(quantity, food) if food else None
+    if grams is None:
+        return None
+    return round(food.kcal_per_100g * grams / 100)
+
+def estimate_workout_calories(workout_type, duration, weight_kg=None): # MET x kg x hours, or None if unknown
+    exercise = exercise_index().get(workout_type or '')
+    if exercise is None or not duration:
+        return None
+    return round(exercise.met * (weight_kg or DEFAULT_WEIGHT_KG) * duration / 60)
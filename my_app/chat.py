@@ -0,0 +1,166 @@
+import asyncio
+import json
+import re
+import threading
+from collections import defaultdict
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.http.cookie import parse_cookie
+from django.http.request import split_domain_port, validate_host
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+from django.utils.module_loading import import_string
+
+from .avatars import athumbnail_for, thumbnail_for
+from .models import Group, Message
+
+CHAT_PATH = re.compile(r'^/ws/groups/(?P<group_id>\d+)/$')
+MAX_MESSAGE_LENGTH = 2000
+
+############################## Pub/Sub Brokers ##############################
+class ChatBroker: # Interface every broker implements; swap implementations with settings.CHAT_BROKER
+    def subscribe(self, channel): # Called on the event loop; returns an asyncio.Queue of published payloads
+        raise NotImplementedError
+
+    def unsubscribe(self, channel, queue):
+        raise NotImplementedError
+
+    def publish(self, channel, payload): # Thread-safe: called from sync views and from the event loop
+        raise NotImplementedError
+
+
+class InMemoryBroker(ChatBroker): # Fans out within a single process (one ASGI worker, tests, load tests)
+    def __init__(self):
+        self._subscribers = defaultdict(set) # channel -> {(event loop, queue)}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers[channel].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, channel, queue):
+        with self._lock:
+            self._subscribers[channel] = {sub for sub in self._subscribers[channel] if sub[1] is not queue}
+            if not self._subscribers[channel]:
+                del self._subscribers[channel]
+
+    def publish(self, channel, payload):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, payload)
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+
+broker = SimpleLazyObject(lambda: import_string(getattr(settings, 'CHAT_BROKER', 'my_app.chat.InMemoryBroker'))())
+
+def group_channel(group_id):
+    return f"group.{group_id}"
+
+
+############################## Posting Messages ##############################
+def message_payload(message, username, avatar=None): # avatar: thumbnail URL, or None without a picture
+    return {
+        'id': message.id,
+        'user': username,
+        'avatar': avatar,
+        'content': message.content,
+        'timestamp': message.timestamp.isoformat(),
+    }
+
+def post_message(group_id, user, content): # Save a chat message and push it to everyone connected to the pack
+    message = Message.objects.create(group_id=group_id, user=user, content=content)
+    broker.publish(group_channel(group_id), message_payload(message, user.username, thumbnail_for(user.pk)))
+    return message
+
+async def apost_message(group_id, user, content): # post_message for async views
+    message = await Message.objects.acreate(group_id=group_id, user=user, content=content)
+    broker.publish(group_channel(group_id), message_payload(message, user.username, await athumbnail_for(user.pk)))
+    return message
+
+
+############################## WebSocket Application ##############################
+def _session_user(scope): # Resolve the logged-in user from the session cookie, like AuthenticationMiddleware does
+    headers = dict(scope.get('headers', ()))
+    cookies = parse_cookie(headers.get(b'cookie', b'').decode('latin-1'))
+    session_key = cookies.get(settings.SESSION_COOKIE_NAME)
+    if not session_key:
+        return None
+
+    session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    user = get_user_model().objects.filter(pk=session.get(SESSION_KEY)).first()
+    if user is None or not user.is_active:
+        return None
+    if not constant_time_compare(session.get(HASH_SESSION_KEY, ''), user.get_session_auth_hash()):
+        return None # Password changed since this session logged in
+    return user
+
+def _origin_allowed(scope): # WebSockets skip CSRF checks, so reject cross-site handshakes here
+    headers = dict(scope.get('headers', ()))
+    origin = headers.get(b'origin')
+    if origin is None:
+        return True
+    host, _ = split_domain_port(origin.decode('latin-1').split('://', 1)[-1])
+    return validate_host(host, settings.ALLOWED_HOSTS)
+
+def _is_member(group_id, user):
+    return Group.members.through.objects.filter(group_id=group_id, user_id=user.pk).exists()
+
+async def relay(channel, receive, send, on_text=None): # Pump broker payloads to the socket until it disconnects
+    queue = broker.subscribe(channel)
+
+    async def read():
+        while True:
+            event = await receive()
+            if event['type'] == 'websocket.disconnect':
+                return
+            if event['type'] == 'websocket.receive' and event.get('text') and on_text:
+                await on_text(event['text'])
+
+    async def write():
+        while True:
+            payload = await queue.get()
+            await send({'type': 'websocket.send', 'text': json.dumps(payload)})
+
+    tasks = [asyncio.ensure_future(read()), asyncio.ensure_future(write())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        broker.unsubscribe(channel, queue)
+
+async def websocket_application(scope, receive, send): # ASGI app for /ws/groups/<id>/, mounted in WolvenfestFitness/asgi.py
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+
+    match = CHAT_PATH.match(scope['path'])
+    if not match or not _origin_allowed(scope):
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+
+    group_id = int(match['group_id'])
+    user = await sync_to_async(_session_user)(scope)
+    if user is None or not await sync_to_async(_is_member)(group_id, user):
+        await send({'type': 'websocket.close', 'code': 4403}) # Only pack members may listen or howl
+        return
+
+    async def on_text(text):
+        try:
+            content = str(json.loads(text).get('content', '')).strip()
+        except (ValueError, AttributeError):
+            return
+        if content:
+            await sync_to_async(post_message)(group_id, user, content[:MAX_MESSAGE_LENGTH])
+
+    await send({'type': 'websocket.accept'})
+    await relay(group_channel(group_id), receive, send, on_text)
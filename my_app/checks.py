@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PROCESS_LOCAL_CACHES = {'django.core.cache.backends.locmem.LocMemCache'}
+
+@register(Tags.caches)
+def check_task_cache(app_configs, **kwargs): # The worker bumps data generations, so it must share the web cache
+    backend = settings.CACHES['default']['BACKEND']
+    if settings.TASKS_EAGER or backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        "Background tasks run in a separate worker, but the default cache is local to each process.",
+        hint="Set WOLF_CACHE_URL (Redis) or WOLF_CACHE_DIR, or WOLF_TASKS_EAGER=1 to run tasks inside each request.",
+        obj='CACHES',
+        id='my_app.E001',
+    )]
@@ -0,0 +1,62 @@
+from django.db import connection
+from django.db.models import BooleanField, Count, F, OuterRef, Q, Subquery
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, Lower
+
+from .models import Group
+
+# Must stay identical to the GIN index expression in migration 0016, or PostgreSQL can't use the index
+SEARCH_DOCUMENT = "to_tsvector('english', coalesce(name, '') || ' ' || coalesce(description, ''))"
+PREFIX_END = '\U0010ffff' # Sorts after every character in code-point order, so [q, q + PREFIX_END) is every key starting with q
+
+############################## Search ##############################
+def search_groups(query=''): # Packs whose name starts with `query`, or whose name/description mention its words
+    groups = Group.objects.annotate(name_key=Lower('name')) # Same expression as group_name_lower_idx
+    query = query.strip()
+    if not query:
+        return groups
+
+    prefix = query.lower()
+    if connection.vendor == 'postgresql':
+        # LIKE 'q%' on lower(name) is served by group_name_pattern_idx (text_pattern_ops, migration 0020); a range
+        # would follow the database collation, which doesn't sort PREFIX_END last
+        matches = Q(name_key__startswith=prefix)
+        text_match = RawSQL(f"{SEARCH_DOCUMENT} @@ plainto_tsquery('english', %s)", [query], output_field=BooleanField())
+        groups = groups.alias(text_match=text_match)
+        matches |= Q(text_match=True)
+    else: # SQLite: LIKE ... ESCAPE can't use the expression index but a range can, and it compares in code-point order
+        matches = Q(name_key__gte=prefix, name_key__lt=prefix + PREFIX_END)
+        matches |= Q(name__icontains=query) | Q(description__icontains=query) # No full-text index; scan instead
+    return groups.filter(matches)
+
+############################## Pagination ##############################
+# Keyset pages in directory order (lowercased name, then id). Cursors look like "42.wolf pack" and point at
+# the last pack of the previous page, so deep pages cost the same as the first.
+def encode_group_cursor(group):
+    return f"{group.id}.{group.name_key}"
+
+def decode_group_cursor(cursor): # Raises ValueError for malformed cursors
+    pk, _, key = cursor.partition('.')
+    return int(pk), key
+
+def group_page(query='', cursor=None, page_size=24):
+    groups = search_groups(query).order_by('name_key', 'id')
+    if cursor:
+        pk, key = decode_group_cursor(cursor)
+        groups = groups.filter(Q(name_key__gt=key) | Q(name_key=key, id__gt=pk))
+
+    rows = list(groups[:page_size + 1]) # One extra row tells us whether there is a next page
+    next_cursor = encode_group_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
+
+############################## Member Counts ##############################
+# Group.member_count is denormalized so the directory and pack pages never count the membership table.
+def members_added(group_ids, added=1): # pk_set on post_add only holds new members, so a plain increment is exact
+    Group.objects.filter(pk__in=group_ids).update(member_count=F('member_count') + added)
+
+def members_left(group_ids): # Called while the departing rows still exist (pre_clear, user pre_delete)
+    Group.objects.filter(pk__in=group_ids).update(member_count=F('member_count') - 1)
+
+def recount_members(group_ids): # remove() reports every requested id, members or not, so recount from the index
+    counts = Group.members.through.objects.filter(group_id=OuterRef('pk')).order_by().values('group_id').annotate(total=Count('*')).values('total')
+    Group.objects.filter(pk__in=group_ids).update(member_count=Coalesce(Subquery(counts), 0))
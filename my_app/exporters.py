@@ -0,0 +1,86 @@
+import csv
+import json
+import zlib
+from itertools import chain
+
+from asgiref.sync import sync_to_async
+
+from . import archive
+from .models import MealLog, Message, UserBadge, Workout
+
+EXPORT_CHUNK_SIZE = 2000 # Rows fetched per database round-trip
+STREAM_BLOCK_SIZE = 64 * 1024 # Bytes handed to the server per chunk of the response
+
+EXPORT_DATASETS = { # Dataset -> (rows of the user, [(column, lookup)])
+    'workouts': (lambda user: Workout.objects.filter(user=user).order_by('date', 'id'), [
+        ('date', 'date'), ('workout_type', 'workout_type'), ('duration', 'duration'),
+        ('sets', 'sets'), ('reps', 'reps'), ('calories_burned', 'calories_burned'),
+    ]),
+    'meals': (lambda user: MealLog.objects.filter(user=user).order_by('date', 'id'), [
+        ('date', 'date'), ('meal_name', 'meal_name'), ('meal_type', 'meal_type'),
+        ('quantity', 'quantity'), ('calories', 'calories'),
+    ]),
+    'badges': (lambda user: UserBadge.objects.filter(user=user).order_by('awarded_at', 'id'), [
+        ('badge', 'badge__name'), ('emoji', 'badge__emoji'), ('awarded_at', 'awarded_at'),
+    ]),
+    'messages': (lambda user: Message.objects.filter(user=user).order_by('timestamp', 'id'), [
+        ('group', 'group__name'), ('content', 'content'), ('timestamp', 'timestamp'),
+    ]),
+}
+
+def _rows(user, dataset): # Plain tuples streamed from a server-side cursor, never a full list
+    queryset, columns = EXPORT_DATASETS[dataset]
+    rows = queryset(user).values_list(*(lookup for _, lookup in columns)).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    if dataset == 'messages': # Archived months come first: they're older than anything left in the table
+        return chain(archive.user_rows(user), rows)
+    return rows
+
+def _text(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+class _Echo: # csv.writer target that hands back each formatted line instead of buffering it
+    def write(self, value):
+        return value
+
+############################## Formats ##############################
+def csv_lines(user, dataset): # Same columns the importer reads, so exports round-trip
+    writer = csv.writer(_Echo())
+    yield writer.writerow([column for column, _ in EXPORT_DATASETS[dataset][1]])
+    for row in _rows(user, dataset):
+        yield writer.writerow([_text(value) for value in row])
+
+def ndjson_lines(user, datasets): # One JSON object per line, tagged with its dataset
+    for dataset in datasets:
+        columns = [column for column, _ in EXPORT_DATASETS[dataset][1]]
+        for row in _rows(user, dataset):
+            record = {'type': dataset, **{column: _text(value) for column, value in zip(columns, row)}}
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+
+############################## Streaming Helpers ##############################
+def encode_blocks(lines, block_size=STREAM_BLOCK_SIZE): # Join small lines into larger UTF-8 blocks
+    block, size = [], 0
+    for line in lines:
+        data = line.encode('utf-8')
+        block.append(data)
+        size += len(data)
+        if size >= block_size:
+            yield b''.join(block)
+            block, size = [], 0
+    if block:
+        yield b''.join(block)
+
+def gzip_blocks(blocks): # Incremental gzip, so compressing never holds the whole export either
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) # wbits=31 writes a gzip header and trailer
+    for block in blocks:
+        compressed = compressor.compress(block)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+async def aiter_blocks(blocks): # For ASGI, which would otherwise read a sync iterator into memory before sending it
+    blocks = iter(blocks)
+    while True:
+        block = await sync_to_async(next)(blocks, None) # Thread-sensitive, so the cursor stays on one connection
+        if block is None:
+            return
+        yield block
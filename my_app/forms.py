@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
+from .catalog import estimate_meal_calories, estimate_workout_calories
 from .models import Workout, MealLog, Group, Profile
 
 # User Registration Form
@@ -45,6 +46,10 @@ class ProfileForm(forms.ModelForm):
             'desired_weight': forms.NumberInput(attrs={'placeholder': 'Target weight (kg)'})
         }
 
+# Profile picture form (processed into thumbnails by my_app/avatars.py)
+class AvatarForm(forms.Form):
+    picture = forms.FileField(widget=forms.FileInput(attrs={'class': 'form-control', 'accept': 'image/*'}))
+
 
 
 # Workout Log Form
@@ -53,27 +58,61 @@ class WorkoutLogForm(forms.ModelForm):
         model = Workout
         fields = ['workout_type', 'duration', 'sets', 'reps', 'calories_burned']
         widgets = { # Widgets to customize the appearance of the form fields
-            'workout_type': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., Push Ups'}),
+            'workout_type': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., Push Ups', 'list': 'exercise-options', 'autocomplete': 'off'}),
             'duration': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Minutes'}),
             'sets': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'e.g., 3'}),
             'reps': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'e.g., 12'}),
-            'calories_burned': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'e.g., 250'}),
+            'calories_burned': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Leave blank to estimate'}),
         }
 
+    def __init__(self, *args, weight_kg=None, **kwargs): # weight_kg comes from the user's profile, for the estimate
+        super().__init__(*args, **kwargs)
+        self.weight_kg = weight_kg
+        self.fields['calories_burned'].required = False # Estimated from the exercise catalog when left blank
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('calories_burned') is None and not self.has_error('calories_burned'):
+            estimate = estimate_workout_calories(cleaned_data.get('workout_type'), cleaned_data.get('duration'), self.weight_kg)
+            if estimate is None:
+                self.add_error('calories_burned', "Enter the calories burned, or pick an exercise from the list so they can be estimated.")
+            else:
+                cleaned_data['calories_burned'] = estimate
+        return cleaned_data
+
 # Meal Log Form
 class MealLogForm(forms.ModelForm):
     class Meta: # Meta class to define the model and fields for the form
         model = MealLog
         fields = ['meal_name', 'meal_type', 'quantity', 'calories']
         widgets = { # Widgets to customize the appearance of the form fields
-            'meal_name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., Chicken Salad'}),
+            'meal_name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., Chicken Salad', 'list': 'food-options', 'autocomplete': 'off'}),
             'meal_type': forms.Select(attrs={'class': 'form-control'}),
-            'quantity': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., 200g'}),
-            'calories': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'e.g., 350'}),
+            'quantity': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., 200g or 1 bowl'}),
+            'calories': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Leave blank to estimate'}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['calories'].required = False # Estimated from the food catalog when left blank
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('calories') is None and not self.has_error('calories'):
+            estimate = estimate_meal_calories(cleaned_data.get('meal_name'), cleaned_data.get('quantity'))
+            if estimate is None:
+                self.add_error('calories', "Enter the calories, or pick a food from the list and a quantity like \"200g\" or \"1 bowl\".")
+            else:
+                cleaned_data['calories'] = estimate
+        return cleaned_data
+
 # Group form (for group management)
 class GroupForm(forms.ModelForm):
     class Meta:
         model = Group
-        fields = ['name', 'description']
\ No newline at end of file
+        fields = ['name', 'description']
+
+# History import form (for bulk uploads of workouts or meals)
+class HistoryImportForm(forms.Form):
+    kind = forms.ChoiceField(choices=[('workouts', 'Workouts'), ('meals', 'Meals')], widget=forms.Select(attrs={'class': 'form-control'}))
+    file = forms.FileField(help_text="CSV with a header row, a JSON array, or NDJSON (one object per line).")
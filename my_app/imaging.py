@@ -0,0 +1,41 @@
+import os
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Pillow work for avatars. Kept free of Django imports so the process pool in avatars.py can run it in
+# spawned workers, which import only this module.
+
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+
+def probe(path, max_pixels): # (format, width, height) read from the header only; ValueError if it isn't a usable image
+    try:
+        with Image.open(path) as image:
+            size, fmt = image.size, image.format
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ValueError("That file isn't a picture we can read.")
+    if fmt not in ALLOWED_FORMATS:
+        raise ValueError("Upload a JPEG, PNG, GIF or WebP picture.")
+    if size[0] * size[1] > max_pixels:
+        raise ValueError("That picture has too many pixels.")
+    return fmt, size[0], size[1]
+
+def render_thumbnails(source, out_dir, stem, sizes): # Square WebP thumbnails with no metadata; returns the source size
+    with Image.open(source) as opened:
+        opened.seek(0) # First frame of animations
+        image = ImageOps.exif_transpose(opened) # Apply the camera rotation before EXIF is dropped
+        width, height = image.size
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            flattened = Image.new('RGB', image.size, (255, 255, 255))
+            flattened.paste(image, mask=image.getchannel('A'))
+            image = flattened
+        else:
+            image = image.convert('RGB')
+
+    os.makedirs(out_dir, exist_ok=True)
+    for size in sizes:
+        target = os.path.join(out_dir, f"{stem}-{size}.webp")
+        partial = target + '.part'
+        ImageOps.fit(image, (size, size), Image.LANCZOS).save(partial, 'WEBP', quality=82, method=6) # No exif/icc passed
+        os.replace(partial, target) # Readers never see a half-written thumbnail
+    return width, height
@@ -0,0 +1,142 @@
+import csv
+import json
+import time
+from dataclasses import dataclass, field
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .forms import MealLogForm, WorkoutLogForm
+from .models import MealLog, Workout
+from .caching import bump_generation
+from .leaderboards import rebuild_leaderboards
+from .summaries import rebuild_daily_summaries
+from .utils import check_and_award_badges
+
+IMPORT_BATCH_SIZE = 1000 # Rows per bulk_create / transaction
+MAX_REPORTED_ERRORS = 20
+MAX_JSON_ROW_CHARS = 1024 * 1024 # A row that still hasn't parsed after this much text is malformed, not just long
+
+IMPORT_KINDS = { # Import kind -> (model, form whose rules each row must pass)
+    'workouts': (Workout, WorkoutLogForm),
+    'meals': (MealLog, MealLogForm),
+}
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    skipped: int = 0
+    errors: list = field(default_factory=list) # (row number, message), capped at MAX_REPORTED_ERRORS
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return (self.imported + self.skipped) / self.elapsed if self.elapsed else 0.0
+
+
+############################## Incremental Parsers ##############################
+def iter_csv_rows(stream): # Text stream with a header row; yields one dict per line
+    yield from csv.DictReader(stream)
+
+def iter_json_rows(stream, chunk_size=64 * 1024): # A JSON array of objects or NDJSON, decoded without loading the whole file
+    decoder = json.JSONDecoder()
+    buffer, pos, eof, started = '', 0, False, False
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos < len(buffer):
+            if not started and buffer[pos] == '[': # Top-level array: rows are its elements
+                started = True
+                pos += 1
+                continue
+            started = True
+            if buffer[pos] == ']':
+                return
+            try:
+                row, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof or len(buffer) - pos > MAX_JSON_ROW_CHARS:
+                    raise ValueError(f"Malformed JSON near: {buffer[pos:pos + 40]!r}")
+            else:
+                yield row
+                continue
+        elif eof:
+            return
+
+        chunk = stream.read(chunk_size) # Need more input: keep only the unparsed tail
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+def iter_rows(stream, fmt):
+    if fmt == 'csv':
+        return iter_csv_rows(stream)
+    if fmt == 'json':
+        return iter_json_rows(stream)
+    raise ValueError(f"Unsupported import format: {fmt}")
+
+
+############################## Import Pipeline ##############################
+def _field_defaults(kind): # Model defaults (e.g. quantity "1 serving") for columns a file leaves out
+    model, form_class = IMPORT_KINDS[kind]
+    return {f.name: f.get_default() for f in model._meta.fields if f.name in form_class.base_fields and f.has_default()}
+
+def _build(user, kind, row, defaults): # Returns an unsaved model instance, or raises ValueError with the reason
+    # Cleans each column with the form's own field objects; building a whole form per row would
+    # deep-copy every field and dominate the import time
+    model, form_class = IMPORT_KINDS[kind]
+    if not isinstance(row, dict):
+        raise ValueError("Each row must be an object.")
+
+    cleaned, errors = {}, []
+    for name, form_field in form_class.base_fields.items():
+        value = row.get(name)
+        try:
+            cleaned[name] = form_field.clean(defaults.get(name) if value in (None, '') else value)
+        except ValidationError as error:
+            errors.append(f"{name}: {' '.join(error.messages)}")
+    if errors:
+        raise ValueError("; ".join(errors))
+
+    obj = model(user=user, **cleaned)
+    if row.get('date'):
+        obj.date = date.fromisoformat(str(row['date']).strip())
+    return obj
+
+def import_rows(user, kind, rows, batch_size=IMPORT_BATCH_SIZE):
+    # bulk_create skips the per-row signals, so badge progress and daily summaries are rebuilt once at the end.
+    # Batches commit as they go, so that also happens when the file turns out to be unreadable partway through.
+    model = IMPORT_KINDS[kind][0]
+    defaults = _field_defaults(kind)
+    result = ImportResult()
+    start = time.perf_counter()
+    batch = []
+
+    def flush():
+        with transaction.atomic():
+            model.objects.bulk_create(batch, batch_size=batch_size)
+        result.imported += len(batch)
+        batch.clear()
+
+    try:
+        for number, row in enumerate(rows, start=1):
+            try:
+                batch.append(_build(user, kind, row, defaults))
+            except ValueError as error:
+                result.skipped += 1
+                if len(result.errors) < MAX_REPORTED_ERRORS:
+                    result.errors.append((number, str(error)))
+                continue
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    finally:
+        if result.imported:
+            rebuild_daily_summaries([user])
+            if kind == 'workouts':
+                rebuild_leaderboards([user])
+            check_and_award_badges(user)
+            bump_generation(user.id)
+    result.elapsed = time.perf_counter() - start
+    return result
@@ -0,0 +1,109 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .avatars import thumbnail_url
+from .models import BadgeProgress, DailySummary, LeaderboardEntry, Workout
+from .streaks import ActivityBitmap
+
+PERIODS = ('week', 'month', 'all')
+METRICS = { # ?metric= value -> (LeaderboardEntry column, label)
+    'calories': ('calories_burned', 'Calories Burned'),
+    'workouts': ('workout_count', 'Workouts'),
+    'streak': ('best_streak', 'Best Streak'),
+}
+
+def period_start(day, period):
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return LeaderboardEntry.ALL_TIME_START
+
+def period_end(start, period): # Last day of the period, or None for all time
+    if period == 'week':
+        return start + timedelta(days=6)
+    if period == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return None
+
+############################## Per-Day Refresh ##############################
+def refresh_periods(user_id, day): # Recompute the user's week, month and all-time rows around `day`
+    # Runs after the day's DailySummary and activity bit are refreshed; totals are re-summed from the rollups,
+    # so repeating it (or running it late) always converges on the right values
+    progress = BadgeProgress.objects.filter(user_id=user_id).only('activity', 'activity_origin').first()
+    bitmap = progress.activity_bitmap if progress else ActivityBitmap()
+    with transaction.atomic():
+        for period in PERIODS:
+            start = period_start(day, period)
+            end = period_end(start, period)
+            days = DailySummary.objects.filter(user_id=user_id)
+            if end is not None:
+                days = days.filter(date__gte=start, date__lte=end)
+            totals = days.aggregate(calories_burned=Sum('calories_burned'), workout_count=Sum('workout_count'))
+            LeaderboardEntry.objects.update_or_create(user_id=user_id, period=period, period_start=start, defaults={
+                'calories_burned': totals['calories_burned'] or 0,
+                'workout_count': totals['workout_count'] or 0,
+                'best_streak': bitmap.longest_streak(start, end),
+            })
+
+############################## Backfill ##############################
+def rebuild_leaderboards(users=None): # Recompute every period's rows from the raw workouts; returns rows written
+    workouts = Workout.objects.all()
+    entries = LeaderboardEntry.objects.all()
+    if users is not None:
+        workouts, entries = workouts.filter(user__in=users), entries.filter(user__in=users)
+
+    rows = {}
+    totals = {'calories': Sum('calories_burned'), 'workouts': Count('id')}
+    grouped = [
+        ('week', workouts.annotate(start=TruncWeek('date')).values('user_id', 'start')),
+        ('month', workouts.annotate(start=TruncMonth('date')).values('user_id', 'start')),
+        ('all', workouts.values('user_id')),
+    ]
+    for period, queryset in grouped:
+        for row in queryset.annotate(**totals).order_by():
+            start = row.get('start', LeaderboardEntry.ALL_TIME_START)
+            rows[row['user_id'], period, start] = LeaderboardEntry(
+                user_id=row['user_id'], period=period, period_start=start,
+                calories_burned=row['calories'] or 0, workout_count=row['workouts'],
+            )
+
+    bitmaps = defaultdict(ActivityBitmap)
+    for user_id, day in workouts.values_list('user_id', 'date').distinct().order_by().iterator():
+        bitmaps[user_id].add(day)
+    for (user_id, period, start), entry in rows.items():
+        entry.best_streak = bitmaps[user_id].longest_streak(start, period_end(start, period))
+
+    with transaction.atomic():
+        entries.delete()
+        LeaderboardEntry.objects.bulk_create(rows.values(), batch_size=1000)
+    return len(rows)
+
+############################## Rankings ##############################
+def _ranked_entries(period, metric, group, day):
+    field = METRICS[metric][0]
+    entries = LeaderboardEntry.objects.filter(period=period, period_start=period_start(day or timezone.localdate(), period))
+    if group is not None:
+        entries = entries.filter(user__custom_groups=group)
+    return entries.filter(**{f'{field}__gt': 0}), field
+
+def top_entries(period, metric, group=None, limit=10, day=None): # [{'rank', 'username', 'avatar', 'score'}], ties share a rank
+    entries, field = _ranked_entries(period, metric, group, day)
+    rows = entries.order_by(f'-{field}', 'user_id').values_list('user__username', 'user__profile__avatar__sha256', field)[:limit]
+    ranked = []
+    for position, (username, avatar, score) in enumerate(rows, start=1):
+        rank = ranked[-1]['rank'] if ranked and ranked[-1]['score'] == score else position
+        ranked.append({'rank': rank, 'username': username, 'avatar': thumbnail_url(avatar), 'score': score})
+    return ranked
+
+def rank_of(user, period, metric, group=None, day=None): # (rank, score), or (None, 0) when the user isn't on the board
+    entries, field = _ranked_entries(period, metric, group, day)
+    score = entries.filter(user=user).values_list(field, flat=True).first()
+    if score is None:
+        return None, 0
+    return entries.filter(**{f'{field}__gt': score}).count() + 1, score
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from my_app.archive import archive_messages
+
+
+class Command(BaseCommand):
+    help = "Move pack chat older than MESSAGE_ARCHIVE_DAYS into compressed per-pack, per-month archives (safe to run from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.MESSAGE_ARCHIVE_DAYS, help="Archive messages older than this many days.")
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError("--days must be at least 1.")
+        moved, written = archive_messages(timezone.now() - timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} messages into {written} pack-months."))
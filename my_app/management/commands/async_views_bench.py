@@ -0,0 +1,133 @@
+import asyncio
+import statistics
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.urls import include, path
+from django.utils.crypto import get_random_string
+
+from my_app import async_views, views
+from my_app.benchmarks import bench_client
+from my_app.models import Group, Message
+
+# This module doubles as the URLconf for the run, serving the sync and async versions side by side
+urlpatterns = [
+    path('sync/groups/<int:group_id>/', views.group_detail),
+    path('async/groups/<int:group_id>/', async_views.group_detail),
+    path('sync/log-workout/', views.log_workout),
+    path('async/log-workout/', async_views.log_workout),
+    path('', include('my_app.urls')), # Redirect targets
+]
+
+SCENARIOS = { # name -> (method, path template, form body)
+    'group_detail': ('GET', '/{variant}/groups/{group_id}/', None),
+    'log_workout': ('POST', '/{variant}/log-workout/', {'workout_type': "Run", 'duration': 30, 'calories_burned': 250}),
+}
+
+
+async def _call(app, method, url, headers, body): # One request through the real ASGI handler; returns the status
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'scheme': 'http',
+        'method': method, 'path': url, 'raw_path': url.encode(), 'query_string': b'', 'root_path': '',
+        'headers': headers, 'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+    }
+    body_sent = False
+    status = None
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        await asyncio.Event().wait() # No disconnect; Django cancels this once the response is sent
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await app(scope, receive, send)
+    return status
+
+
+class Command(BaseCommand):
+    help = "Compare the sync and async chat/logging views under concurrent load through the ASGI handler."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Requests per scenario and variant.")
+        parser.add_argument('--concurrency', type=int, default=50, help="Requests in flight at once.")
+        parser.add_argument('--scenario', choices=sorted(SCENARIOS), action='append', help="Only run this scenario (repeatable).")
+
+    def handle(self, *args, **options):
+        stamp = time.time_ns()
+        user = get_user_model().objects.create_user(f"asyncbench-{stamp}")
+        group = Group.objects.create(name=f"asyncbench-{stamp}")
+        group.members.add(user)
+        Message.objects.bulk_create(Message(group=group, user=user, content=f"Howl {i}") for i in range(settings.CHAT_HISTORY_LIMIT))
+
+        csrf_secret = get_random_string(32)
+        cookies = f"{settings.SESSION_COOKIE_NAME}={bench_client(user).cookies[settings.SESSION_COOKIE_NAME].value}; {settings.CSRF_COOKIE_NAME}={csrf_secret}"
+        headers = [(b'host', b'localhost'), (b'cookie', cookies.encode()), (b'x-csrftoken', csrf_secret.encode())]
+
+        rows = []
+        try:
+            with override_settings(ROOT_URLCONF=__name__):
+                app = get_asgi_application()
+                for name in options['scenario'] or sorted(SCENARIOS):
+                    for variant in ('sync', 'async'):
+                        rows.append((name, variant, asyncio.run(self.drive(app, name, variant, group.id, headers, options))))
+        finally:
+            user.delete()
+            group.delete()
+
+        self.stdout.write(f"{'scenario':<14}{'variant':<9}{'req/s':>9}{'p50 ms':>10}{'p99 ms':>10}{'peak threads':>14}{'errors':>8}")
+        for name, variant, result in rows:
+            self.stdout.write(
+                f"{name:<14}{variant:<9}{result['rate']:>9,.0f}{result['p50']:>10.1f}{result['p99']:>10.1f}"
+                f"{result['threads']:>14}{result['errors']:>8}"
+            )
+
+    async def drive(self, app, name, variant, group_id, headers, options):
+        method, template, form = SCENARIOS[name]
+        url = template.format(variant=variant, group_id=group_id)
+        body = urlencode(form).encode() if form else b''
+        request_headers = headers + ([(b'content-type', b'application/x-www-form-urlencoded')] if form else [])
+
+        slots = asyncio.Semaphore(options['concurrency'])
+        latencies, statuses = [], Counter()
+        peak_threads = threading.active_count()
+
+        async def one():
+            async with slots:
+                start = time.perf_counter()
+                statuses[await _call(app, method, url, request_headers, body)] += 1
+                latencies.append(time.perf_counter() - start)
+
+        async def watch_threads(): # Each request that runs sync code holds a thread; count them while the load runs
+            nonlocal peak_threads
+            while True:
+                peak_threads = max(peak_threads, threading.active_count())
+                await asyncio.sleep(0.005)
+
+        watcher = asyncio.create_task(watch_threads())
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(options['requests'])))
+        elapsed = time.perf_counter() - start
+        watcher.cancel()
+
+        cuts = statistics.quantiles(latencies, n=100)
+        expected = 302 if method == 'POST' else 200
+        return {
+            'rate': len(latencies) / elapsed,
+            'p50': cuts[49] * 1000,
+            'p99': cuts[98] * 1000,
+            'threads': peak_threads,
+            'errors': sum(count for status, count in statuses.items() if status != expected),
+        }
@@ -0,0 +1,23 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from my_app.leaderboards import rebuild_leaderboards
+from my_app.summaries import rebuild_daily_summaries
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DailySummary rollups and leaderboard rankings from the raw workout and meal logs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', help="Only rebuild this user (repeatable).")
+
+    def handle(self, *args, **options):
+        users = None
+        if options['usernames']:
+            users = get_user_model().objects.filter(username__in=options['usernames'])
+            if users.count() != len(set(options['usernames'])):
+                raise CommandError("One or more users do not exist.")
+
+        written = rebuild_daily_summaries(users)
+        ranked = rebuild_leaderboards(users)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} daily summaries and {ranked} leaderboard entries."))
@@ -0,0 +1,31 @@
+import os
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from my_app.assets import build_image_variants
+from my_app.storage import brotli
+
+
+class Command(BaseCommand):
+    help = "Build responsive image variants, then collect hashed, pre-compressed static files into STATIC_ROOT."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--widths', type=int, nargs='+', default=settings.RESPONSIVE_IMAGE_WIDTHS, help="Variant widths in pixels.")
+        parser.add_argument('--skip-images', action='store_true', help="Reuse the variants already in STATIC_BUILD_DIR.")
+
+    def handle(self, *args, **options):
+        if not options['skip_images']:
+            variants = build_image_variants(options['widths'])
+            self.stdout.write(f"Built {sum(len(entry['webp']) + len(entry['jpeg']) for entry in variants.values())} variants of {len(variants)} images.")
+
+        source_dirs = [directory for directory in settings.STATICFILES_DIRS if directory != settings.STATIC_BUILD_DIR]
+        if os.path.isdir(settings.STATIC_BUILD_DIR): # May not have existed when settings were loaded
+            source_dirs.append(settings.STATIC_BUILD_DIR)
+        with override_settings(STATICFILES_DIRS=source_dirs):
+            call_command('collectstatic', interactive=False, clear=True, verbosity=options['verbosity'])
+        if brotli is None:
+            self.stdout.write("Brotli is not installed, so only gzip copies were written (pip install brotli).")
+        self.stdout.write(self.style.SUCCESS(f"Static files are ready in {settings.STATIC_ROOT}."))
@@ -0,0 +1,71 @@
+import asyncio
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from my_app.chat import broker, group_channel, relay
+
+
+class Command(BaseCommand):
+    help = "Load test pack chat fan-out: many sockets on one pack, measuring delivery throughput and latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sockets', type=int, default=300, help="Concurrent sockets subscribed to the pack.")
+        parser.add_argument('--messages', type=int, default=200, help="Messages published to the pack.")
+        parser.add_argument('--rate', type=float, default=0, help="Messages per second to publish (0 = as fast as possible).")
+
+    def handle(self, *args, **options):
+        results = asyncio.run(self.run(options['sockets'], options['messages'], options['rate']))
+        for label, value in results:
+            self.stdout.write(f"{label:<24}{value}")
+
+    async def run(self, sockets, messages, rate):
+        channel = group_channel('loadtest')
+        latencies = []
+
+        async def client(): # Drives the real relay loop with an in-memory ASGI receive/send pair
+            finished = asyncio.get_running_loop().create_future()
+            received = 0
+
+            async def receive():
+                await finished
+                return {'type': 'websocket.disconnect'}
+
+            async def send(event):
+                nonlocal received
+                latencies.append(time.perf_counter() - json.loads(event['text'])['sent'])
+                received += 1
+                if received == messages:
+                    finished.set_result(None)
+
+            await relay(channel, receive, send)
+
+        clients = [asyncio.create_task(client()) for _ in range(sockets)]
+        while broker.subscriber_count(channel) < sockets:
+            await asyncio.sleep(0)
+
+        def publish(): # Publish from a worker thread, the way sync views do
+            for i in range(messages):
+                broker.publish(channel, {'id': i, 'sent': time.perf_counter()})
+                if rate:
+                    time.sleep(1 / rate)
+
+        start = time.perf_counter()
+        await asyncio.to_thread(publish)
+        await asyncio.gather(*clients)
+        elapsed = time.perf_counter() - start
+
+        deliveries = len(latencies)
+        cuts = statistics.quantiles(latencies, n=100)
+        return [
+            ("sockets", sockets),
+            ("messages published", messages),
+            ("deliveries", deliveries),
+            ("elapsed", f"{elapsed:.3f} s"),
+            ("messages/second", f"{messages / elapsed:,.0f}"),
+            ("deliveries/second", f"{deliveries / elapsed:,.0f}"),
+            ("p50 latency", f"{cuts[49] * 1000:.2f} ms"),
+            ("p99 latency", f"{cuts[98] * 1000:.2f} ms"),
+        ]
@@ -0,0 +1,65 @@
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+from django.urls import reverse
+
+from my_app.benchmarks import bench_client
+from my_app.models import Group
+
+
+class Command(BaseCommand):
+    help = "Measure write throughput for simultaneous log_workout and pack chat posts on the configured database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help="Concurrent writers (half log workouts, half chat).")
+        parser.add_argument('--seconds', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        stamp = time.time_ns()
+        users = [User.objects.create_user(f"dbbench-{stamp}-{i}") for i in range(options['threads'])]
+        group = Group.objects.create(name=f"dbbench-{stamp}")
+        group.members.add(*users)
+
+        counts = {'workouts': 0, 'messages': 0, 'errors': 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['seconds']
+
+        def writer(user, chat): # Each thread gets its own client and database connection
+            client = bench_client(user)
+            url = reverse('group_detail', args=[group.id]) if chat else reverse('log_workout')
+            data = {'message': "Howl"} if chat else {'workout_type': "Run", 'duration': 30, 'calories_burned': 250}
+            try:
+                while time.perf_counter() < deadline:
+                    try:
+                        response = client.post(url, data)
+                        key = 'errors' if response.status_code != 302 else 'messages' if chat else 'workouts'
+                    except DatabaseError: # e.g. "database is locked" once the busy timeout runs out
+                        key = 'errors'
+                    with lock:
+                        counts[key] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=writer, args=(user, i % 2 == 1)) for i, user in enumerate(users)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        User.objects.filter(pk__in=[user.pk for user in users]).delete()
+        group.delete()
+
+        writes = counts['workouts'] + counts['messages']
+        self.stdout.write(f"profile            {settings.DB_PROFILE} ({connection.vendor})")
+        self.stdout.write(f"threads            {options['threads']}")
+        self.stdout.write(f"workouts logged    {counts['workouts']}")
+        self.stdout.write(f"chat posts         {counts['messages']}")
+        self.stdout.write(f"failed requests    {counts['errors']}")
+        self.stdout.write(f"writes/second      {writes / elapsed:,.1f}")
@@ -0,0 +1,35 @@
+import io
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from my_app.importers import IMPORT_BATCH_SIZE, IMPORT_KINDS, import_rows, iter_rows
+
+
+class Command(BaseCommand):
+    help = "Bulk import a user's workout or meal history from a CSV or JSON/NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('kind', choices=sorted(IMPORT_KINDS))
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'json'], help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f"User {options['username']!r} does not exist.")
+
+        path = Path(options['path'])
+        fmt = options['format'] or ('csv' if path.suffix.lower() == '.csv' else 'json')
+        with io.open(path, encoding='utf-8-sig', newline='') as stream:
+            result = import_rows(user, options['kind'], iter_rows(stream, fmt), options['batch_size'])
+
+        for number, message in result.errors:
+            self.stderr.write(f"Row {number}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.imported} {options['kind']} ({result.skipped} skipped) "
+            f"in {result.elapsed:.2f}s - {result.rows_per_second:,.0f} rows/s."
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from my_app.benchmarks import DEFAULT_SIZES, check_results, format_results, load_baseline, run_benchmarks, write_baseline
+
+
+class Command(BaseCommand):
+    help = "Seed synthetic users and record query count, wall time and peak memory for every my_app route."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help="Rows per table to seed.")
+        parser.add_argument('--route', action='append', dest='routes', help="Only benchmark this URL name (repeatable).")
+        parser.add_argument('--write-baseline', action='store_true', help="Store the worst query count per route.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic(): # Seeded users never outlive the run
+            results = run_benchmarks(options['sizes'], options['routes'])
+            transaction.set_rollback(True)
+
+        self.stdout.write(format_results(results))
+        if options['write_baseline']:
+            write_baseline(results)
+            self.stdout.write(self.style.SUCCESS("Baseline written."))
+            return
+
+        failures = check_results(results, load_baseline())
+        if failures:
+            raise CommandError("\n".join(failures))
+        self.stdout.write(self.style.SUCCESS("No query regressions."))
@@ -0,0 +1,51 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from my_app.tasks import claim_tasks, purge_finished, run_task
+
+PURGE_EVERY = 60 # Seconds between clean-ups of finished tasks
+
+
+def _run(claimed): # Each pool thread keeps its own connection; drop it if it went stale between tasks
+    close_old_connections()
+    return run_task(claimed)
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks (badges, daily summaries, leaderboards) until interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help="Tasks run concurrently by this worker.")
+        parser.add_argument('--batch', type=int, default=20, help="Tasks claimed per round-trip.")
+        parser.add_argument('--poll', type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Exit once no task is due instead of polling.")
+
+    def handle(self, *args, **options):
+        # For more throughput run several of these processes; claiming is safe across workers
+        succeeded = failed = 0
+        last_purge = 0.0
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            try:
+                while True:
+                    if time.monotonic() - last_purge > PURGE_EVERY:
+                        purge_finished()
+                        last_purge = time.monotonic()
+
+                    claimed = claim_tasks(options['batch'])
+                    if not claimed:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll'])
+                        continue
+
+                    results = list(pool.map(_run, claimed))
+                    succeeded += results.count(True)
+                    failed += results.count(False)
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f"Ran {len(results)} tasks ({results.count(False)} failed)")
+            except KeyboardInterrupt:
+                pass
+        self.stdout.write(self.style.SUCCESS(f"Ran {succeeded + failed} tasks: {succeeded} succeeded, {failed} failed."))
@@ -0,0 +1,27 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from my_app.routers import REPLICA
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database into the WOLF_REPLICA_DB file (a local stand-in for a streaming replica)."
+
+    def handle(self, *args, **options):
+        if REPLICA not in settings.DATABASES:
+            raise CommandError("Set WOLF_REPLICA_DB to the replica file first.")
+        if settings.DATABASES[REPLICA]['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError("Only SQLite replicas are copied; PostgreSQL replicas follow the primary through replication.")
+
+        primary = connections['default']
+        primary.ensure_connection()
+        target = sqlite3.connect(settings.DATABASES[REPLICA]['NAME'])
+        try:
+            primary.connection.backup(target) # Consistent snapshot, even while the server is writing
+        finally:
+            target.close()
+        connections[REPLICA].close() # This process reopens it on the next read
+        self.stdout.write(self.style.SUCCESS(f"Replica {settings.DATABASES[REPLICA]['NAME']} now matches the primary."))
@@ -0,0 +1,87 @@
+import statistics
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+
+from my_app.models import Avatar, Group, MealLog, Message, Profile, Workout
+from my_app.render_profiler import install, profile_renders
+
+# Renders the heaviest list pages from unsaved in-memory rows, so it measures template CPU only (no database)
+
+def _workouts(rows):
+    start = date(2025, 1, 1)
+    return [
+        Workout(id=i, date=start + timedelta(days=i % 365), workout_type="Running", duration=30, sets=3, reps=12, calories_burned=250 + i % 100)
+        for i in range(1, rows + 1)
+    ]
+
+def _meals(rows):
+    start = date(2025, 1, 1)
+    return [
+        MealLog(id=i, date=start + timedelta(days=i % 365), meal_name="Chicken salad", meal_type="Lunch", quantity="1 bowl", calories=400 + i % 50)
+        for i in range(1, rows + 1)
+    ]
+
+def _messages(rows, group):
+    users = []
+    for i in range(20): # A pack's worth of authors, half of them with a picture
+        user = get_user_model()(id=i + 1, username=f"wolf{i}")
+        user.profile = Profile(user=user, avatar=Avatar(sha256=f"{i:064x}", width=256, height=256) if i % 2 else None)
+        users.append(user)
+    start = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+    return [
+        Message(id=i, group=group, user=users[i % len(users)], content=f"Howl number {i}, who's running tonight?", timestamp=start + timedelta(minutes=i))
+        for i in range(1, rows + 1)
+    ]
+
+class Command(BaseCommand):
+    help = "Time rendering dashboard.html and groups/group_detail.html with thousands of rows, with a per-template/block breakdown."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000, 5000], help="Rows per list (workouts, meals, messages).")
+        parser.add_argument('--repeat', type=int, default=10, help="Renders per page and size.")
+        parser.add_argument('--top', type=int, default=5, help="Slowest templates/blocks to list per page.")
+
+    def handle(self, *args, **options):
+        install() # No-op when TEMPLATE_PROFILING already installed the hooks
+        request = RequestFactory().get('/')
+        request.user = get_user_model()(id=1, username="wolf0")
+        group = Group(id=1, name="Bench Pack", description="Synthetic pack", member_count=20)
+
+        pages = {
+            'dashboard': lambda rows: self.render_dashboard(request, _workouts(rows), _meals(rows)),
+            'group_detail': lambda rows: render_to_string('groups/group_detail.html', {
+                'group': group, 'is_member': True, 'messages': _messages(rows, group),
+            }, request),
+        }
+
+        self.stdout.write(f"{'page':<14}{'rows':>7}{'mean ms':>10}{'p95 ms':>10}{'us/row':>9}")
+        breakdowns = []
+        for name, render in pages.items():
+            for rows in options['rows']:
+                render(rows) # Warm the template cache
+                timings, profile = [], None
+                for _ in range(options['repeat']):
+                    with profile_renders() as profile:
+                        start = time.perf_counter()
+                        render(rows)
+                        timings.append(time.perf_counter() - start)
+                mean = statistics.fmean(timings)
+                p95 = sorted(timings)[max(0, round(len(timings) * 0.95) - 1)]
+                self.stdout.write(f"{name:<14}{rows:>7}{mean * 1000:>10.1f}{p95 * 1000:>10.1f}{mean * 1e6 / rows:>9.1f}")
+            breakdowns.append((name, rows, profile))
+
+        for name, rows, profile in breakdowns: # From the last render of the largest size
+            self.stdout.write(f"\n{name} at {rows} rows, slowest by self time:")
+            for kind, node, calls, inclusive, own in profile.slowest(options['top']):
+                self.stdout.write(f"  {own * 1000:8.2f} ms self {inclusive * 1000:8.2f} ms total  {calls:>5}x  {kind} {node}")
+
+    def render_dashboard(self, request, workouts, meals): # Same two steps as views.dashboard without the fragment cache
+        return render_to_string('dashboard.html', {
+            'workouts_html': render_to_string('partials/workout_feed.html', {'items': workouts, 'next_cursor': "bench"}),
+            'meals_html': render_to_string('partials/meal_feed.html', {'items': meals, 'next_cursor': "bench"}),
+        }, request)
@@ -0,0 +1,112 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0) # Seconds, Prometheus-style upper bounds
+
+_IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+
+def _label(value): # Escape a Prometheus label value
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def sql_shape(sql): # Same statement with different parameters (or IN-list lengths) maps to one shape
+    return _NUMBER.sub('?', _IN_LIST.sub('(...)', sql))
+
+############################## Per-Request Recording ##############################
+class QueryRecorder: # connection.execute_wrapper callable counting queries and SQL time for one request
+    def __init__(self, alias):
+        self.alias = alias
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+            self.shapes[sql_shape(sql)] += 1
+
+############################## Process-Wide Registry ##############################
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1)) # view -> bucket counts (+Inf last)
+            self.latency_sum = defaultdict(float)
+            self.queries = defaultdict(int) # (view, alias) -> queries
+            self.sql_seconds = defaultdict(float) # (view, alias) -> seconds
+            self.n_plus_one = defaultdict(int) # view -> requests with a repeated query shape
+            self.gauges = {} # name -> (help, value) for values sampled elsewhere, e.g. queue depth
+            self.render_seconds = defaultdict(float) # (view, kind, name) -> self time in templates/blocks/includes
+            self.renders = defaultdict(int) # (view, kind, name) -> times rendered
+
+    def observe(self, view, seconds, recorders, repeated_shapes):
+        with self._lock:
+            self.requests[view][bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self.latency_sum[view] += seconds
+            for recorder in recorders:
+                self.queries[view, recorder.alias] += recorder.count
+                self.sql_seconds[view, recorder.alias] += recorder.seconds
+            if repeated_shapes:
+                self.n_plus_one[view] += 1
+
+    def observe_templates(self, view, profile): # profile: render_profiler.RenderProfile of one request
+        with self._lock:
+            for (kind, name), (calls, _, own) in profile.entries.items():
+                self.render_seconds[view, kind, name] += own
+                self.renders[view, kind, name] += calls
+
+    def set_gauge(self, name, help_text, value):
+        with self._lock:
+            self.gauges[name] = (help_text, value)
+
+    def render(self): # Prometheus text exposition format
+        with self._lock:
+            lines = [
+                "# HELP wolf_request_seconds View latency.",
+                "# TYPE wolf_request_seconds histogram",
+            ]
+            for view, buckets in sorted(self.requests.items()):
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + (float('inf'),), buckets):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'wolf_request_seconds_bucket{{view="{view}",le="{le}"}} {cumulative}')
+                lines.append(f'wolf_request_seconds_sum{{view="{view}"}} {self.latency_sum[view]:.6f}')
+                lines.append(f'wolf_request_seconds_count{{view="{view}"}} {cumulative}')
+
+            lines += ["# HELP wolf_db_queries_total SQL queries run by sampled requests.", "# TYPE wolf_db_queries_total counter"]
+            for (view, alias), count in sorted(self.queries.items()):
+                lines.append(f'wolf_db_queries_total{{view="{view}",alias="{alias}"}} {count}')
+
+            lines += ["# HELP wolf_db_seconds_total Time spent in SQL by sampled requests.", "# TYPE wolf_db_seconds_total counter"]
+            for (view, alias), seconds in sorted(self.sql_seconds.items()):
+                lines.append(f'wolf_db_seconds_total{{view="{view}",alias="{alias}"}} {seconds:.6f}')
+
+            lines += ["# HELP wolf_n_plus_one_total Sampled requests that repeated one SQL shape past the threshold.", "# TYPE wolf_n_plus_one_total counter"]
+            for view, count in sorted(self.n_plus_one.items()):
+                lines.append(f'wolf_n_plus_one_total{{view="{view}"}} {count}')
+
+            lines += ["# HELP wolf_render_seconds_total Self time of each template, block and include in sampled requests.", "# TYPE wolf_render_seconds_total counter"]
+            for (view, kind, name), seconds in sorted(self.render_seconds.items()):
+                lines.append(f'wolf_render_seconds_total{{view="{view}",kind="{kind}",name="{_label(name)}"}} {seconds:.6f}')
+
+            lines += ["# HELP wolf_renders_total Times each template, block and include was rendered in sampled requests.", "# TYPE wolf_renders_total counter"]
+            for (view, kind, name), count in sorted(self.renders.items()):
+                lines.append(f'wolf_renders_total{{view="{view}",kind="{kind}",name="{_label(name)}"}} {count}')
+
+            for name, (help_text, value) in sorted(self.gauges.items()):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+            return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry() # Per process; scrape each worker
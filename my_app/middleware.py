@@ -0,0 +1,129 @@
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .metrics import QueryRecorder, registry
+from .render_profiler import profile_renders
+from .routers import begin_request, current_state, end_request
+
+logger = logging.getLogger(__name__)
+
+
+# Records per-view latency, query counts and SQL time for a sample of requests, and flags likely N+1 patterns.
+# Works in both sync and async stacks, so async views under ASGI aren't pushed back onto a thread by this middleware.
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.METRICS_SAMPLE_RATE: # Unsampled requests pay for one random() call
+            return self.get_response(request)
+
+        recorders = [QueryRecorder(alias) for alias in connections]
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            self._record(stack, recorders)
+            renders = stack.enter_context(profile_renders())
+            response = self.get_response(request)
+        self._observe(request, response, time.perf_counter() - start, recorders, renders)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        # Connections are per thread, and ASGI runs a request's ORM calls on one thread of their own, so the
+        # wrappers are installed and removed from that thread rather than the event loop's
+        recorders = [QueryRecorder(alias) for alias in connections]
+        start = time.perf_counter()
+        stack = ExitStack()
+        await sync_to_async(self._record)(stack, recorders)
+        try:
+            with profile_renders() as renders: # Sync views see it too: sync_to_async copies the context
+                response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self._observe(request, response, time.perf_counter() - start, recorders, renders)
+        return response
+
+    def _record(self, stack, recorders):
+        for connection, recorder in zip(connections.all(), recorders):
+            stack.enter_context(connection.execute_wrapper(recorder))
+
+    def _observe(self, request, response, elapsed, recorders, renders):
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        repeated = [
+            (shape, count) for recorder in recorders for shape, count in recorder.shapes.items()
+            if count >= settings.N_PLUS_ONE_THRESHOLD
+        ]
+        for shape, count in repeated:
+            logger.warning("Possible N+1 in %s: %d x %s", view, count, shape)
+        registry.observe(view, elapsed, recorders, repeated)
+
+        if not renders.entries: # Redirects, JSON and pre-rendered fragments served from cache
+            return
+        registry.observe_templates(view, renders)
+        slowest = renders.slowest(settings.TEMPLATE_REPORT_LIMIT)
+        if renders.total >= settings.TEMPLATE_SLOW_SECONDS:
+            logger.warning("Slow render in %s (%.1f ms): %s", view, renders.total * 1000, ", ".join(
+                f"{kind} {name} {own * 1000:.1f} ms" for kind, name, _, _, own in slowest
+            ))
+        if settings.DEBUG: # Shows up in the browser's network panel
+            response['Server-Timing'] = ", ".join(
+                [f'render;dur={renders.total * 1000:.2f}'] +
+                [f'tpl{index};desc="{kind} {name}";dur={own * 1000:.2f}' for index, (kind, name, _, _, own) in enumerate(slowest)]
+            )
+
+
+# Pins a client's reads to the primary for REPLICA_STICKY_SECONDS after it writes, so someone who just logged a
+# workout or posted in chat never reads a replica that hasn't caught up yet. Installed when REPLICA_DB is set.
+class ReplicaStickinessMiddleware:
+    sync_capable = True
+    async_capable = True
+    cookie_name = 'wolf_primary'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = begin_request(self.cookie_name in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request(token)
+        return self._stick(state, response)
+
+    async def __acall__(self, request):
+        state, token = begin_request(self.cookie_name in request.COOKIES)
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_request(token)
+        return self._stick(state, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = current_state()
+        if state is not None:
+            state.replica = getattr(view_func, 'replica_reads', False)
+
+    def _stick(self, state, response):
+        if state.wrote: # Every write restarts the window
+            response.set_cookie(self.cookie_name, '1', max_age=settings.REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax')
+        return response
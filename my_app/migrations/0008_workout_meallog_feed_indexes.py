@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0007_remove_userbadge_date_awarded_userbadge_awarded_at_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='meallog',
+            index=models.Index(fields=['user', '-date', '-id'], name='meallog_user_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['user', '-date', '-id'], name='workout_user_date_id_idx'),
+        ),
+    ]
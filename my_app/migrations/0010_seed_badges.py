@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+BADGES = [ # Seed catalog so no request ever has to create the built-in badges
+    {"name": "🔥 5-Day Streak", "description": "Complete 5 days of workouts in a row.", "emoji": "🔥"},
+    {"name": "🌲 Trail Hunter", "description": "Complete 10 total workouts.", "emoji": "🌲"},
+    {"name": "🐾 Pack Leader", "description": "Joined a wolf pack group!", "emoji": "🐾"},
+]
+
+
+def seed_badges(apps, schema_editor):
+    Badge = apps.get_model('my_app', 'Badge')
+    for badge_data in BADGES:
+        Badge.objects.get_or_create(
+            name=badge_data["name"],
+            defaults={"description": badge_data["description"], "emoji": badge_data["emoji"]},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0009_badgeprogress'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_badges, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0010_seed_badges'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('calories_in', models.IntegerField(default=0)),
+                ('calories_burned', models.IntegerField(default=0)),
+                ('workout_count', models.IntegerField(default=0)),
+                ('breakfast_count', models.IntegerField(default=0)),
+                ('lunch_count', models.IntegerField(default=0)),
+                ('dinner_count', models.IntegerField(default=0)),
+                ('snack_count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'date'), name='dailysummary_user_date_unique')],
+            },
+        ),
+    ]
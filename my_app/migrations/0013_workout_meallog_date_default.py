@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:12
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0012_message_group_timestamp_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='meallog',
+            name='date',
+            field=models.DateField(default=datetime.date.today),
+        ),
+        migrations.AlterField(
+            model_name='workout',
+            name='date',
+            field=models.DateField(default=datetime.date.today),
+        ),
+    ]
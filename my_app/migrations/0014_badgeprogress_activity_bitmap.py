@@ -0,0 +1,44 @@
+from django.db import migrations, models
+
+
+def reset_progress(apps, schema_editor):
+    # Streak counters can't be turned into a day-by-day bitmap, so drop the rows; badges.rebuild_progress
+    # recreates each one from the user's workout history the next time it is needed
+    apps.get_model('my_app', 'BadgeProgress').objects.all().delete()
+
+
+def seed_badges(apps, schema_editor):
+    apps.get_model('my_app', 'Badge').objects.get_or_create(
+        name="🌕 Full Moon Streak",
+        defaults={"description": "Complete 30 days of workouts in a row.", "emoji": "🌕"},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0013_workout_meallog_date_default'),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_progress, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='badgeprogress',
+            name='current_streak',
+        ),
+        migrations.RemoveField(
+            model_name='badgeprogress',
+            name='last_workout_date',
+        ),
+        migrations.AddField(
+            model_name='badgeprogress',
+            name='activity',
+            field=models.BinaryField(blank=True, default=bytes),
+        ),
+        migrations.AddField(
+            model_name='badgeprogress',
+            name='activity_origin',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(seed_badges, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0014_badgeprogress_activity_bitmap'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('week', 'This Week'), ('month', 'This Month'), ('all', 'All Time')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('calories_burned', models.IntegerField(default=0)),
+                ('workout_count', models.IntegerField(default=0)),
+                ('best_streak', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'period_start', '-calories_burned'], name='leaderboard_calories_idx'), models.Index(fields=['period', 'period_start', '-workout_count'], name='leaderboard_workouts_idx'), models.Index(fields=['period', 'period_start', '-best_streak'], name='leaderboard_streak_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'period', 'period_start'), name='leaderboard_user_period_unique')],
+            },
+        ),
+    ]
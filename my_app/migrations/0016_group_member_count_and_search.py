@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:29
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_members(apps, schema_editor):
+    Group = apps.get_model('my_app', 'Group')
+    for group in Group.objects.annotate(total=Count('members')).only('id'):
+        Group.objects.filter(pk=group.pk).update(member_count=group.total)
+
+
+# Same expression my_app.directory.SEARCH_DOCUMENT queries with, so the planner can use the index
+SEARCH_INDEX = (
+    "CREATE INDEX IF NOT EXISTS group_search_gin ON my_app_group "
+    "USING GIN (to_tsvector('english', coalesce(name, '') || ' ' || coalesce(description, '')))"
+)
+
+def create_search_index(apps, schema_editor): # Full-text search is PostgreSQL-only; other databases fall back to scans
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(SEARCH_INDEX)
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS group_search_gin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0015_leaderboardentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='group_name_lower_idx'),
+        ),
+        migrations.RunPython(count_members, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+# Same expression as my_app.directory's name_key, with pattern ops so LIKE 'q%' can use it under any collation
+PATTERN_INDEX = "CREATE INDEX IF NOT EXISTS group_name_pattern_idx ON my_app_group (lower(name) text_pattern_ops)"
+
+def create_pattern_index(apps, schema_editor): # SQLite compares in code-point order already; only PostgreSQL needs it
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(PATTERN_INDEX)
+
+def drop_pattern_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS group_name_pattern_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0019_message_archive'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_pattern_index, drop_pattern_index),
+    ]
@@ -1,7 +1,11 @@
 from django.contrib.auth.models import AbstractUser, Group, Permission, User
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+from datetime import date
+
+from .streaks import ActivityBitmap
 
 ####### Basic User Profile and Fitness Tracking Models ########
 ######### User Management #########
@@ -31,9 +35,20 @@ def default_user(): # Default user function to return the first user in the data
     first_user = User.objects.first() # Get the first user in the database
     return first_user.id if first_user else None  # Ensure it returns None if no user exists
 
+# Processed profile picture. Named by the upload's SHA-256, so identical uploads share one set of thumbnails
+class Avatar(models.Model):
+    sha256 = models.CharField(max_length=64, unique=True)
+    width = models.PositiveIntegerField() # Of the upload, before cropping
+    height = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256[:12]
+
 # Profile model for personalized fitness information
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE) # One-to-one
+    avatar = models.ForeignKey(Avatar, null=True, blank=True, on_delete=models.SET_NULL, related_name='profiles')
     weight = models.FloatField(null=True, blank=True) 
     height_feet = models.IntegerField(null=True, blank=True)
     height_inches = models.IntegerField(null=True, blank=True)
@@ -43,24 +58,36 @@ class Profile(models.Model):
     def __str__(self): # String representation of the profile
         return f"{self.user.username}'s Profile"
 
+def profile_for(user): # The user's profile, cached on the user object; created here for accounts that predate profiles
+    try:
+        return user.profile # One query the first time, then Django's related-object cache
+    except Profile.DoesNotExist:
+        user.profile, _ = Profile.objects.get_or_create(user=user)
+        return user.profile
+
 
 ######################## Workout & Meal logging models #######################
 class Workout(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    date = models.DateField(auto_now_add=True)
+    date = models.DateField(default=date.today) # Defaults to today; imports can set historical dates
     workout_type = models.CharField(max_length=100, help_text="E.g., Running, Weight Training")
     duration = models.PositiveIntegerField(help_text="Duration in minutes")
     sets = models.PositiveIntegerField(null=True, blank=True, help_text="Number of sets (if applicable)")
     reps = models.PositiveIntegerField(null=True, blank=True, help_text="Reps per set (if applicable)")
     calories_burned = models.PositiveIntegerField(help_text="Estimated calories burned")
 
+    class Meta:
+        indexes = [ # Composite index backing the keyset-paginated dashboard feed
+            models.Index(fields=['user', '-date', '-id'], name='workout_user_date_id_idx'),
+        ]
+
     def __str__(self): # String representation of the workout log
         return f"{self.user.username} - {self.workout_type} on {self.date}"
 
 # Meal logging model
 class MealLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    date = models.DateField(auto_now_add=True)
+    date = models.DateField(default=date.today) # Defaults to today; imports can set historical dates
     meal_name = models.CharField(max_length=100, help_text="Name of the meal (e.g., Grilled Chicken Salad)", default="Default Meal")
     meal_type = models.CharField(
         max_length=50,
@@ -75,9 +102,34 @@ class MealLog(models.Model):
     quantity = models.CharField(max_length=100, help_text="e.g., 1 bowl, 200g", default="1 serving")
     calories = models.PositiveIntegerField(help_text="Total calorie intake")
 
+    class Meta:
+        indexes = [ # Composite index backing the keyset-paginated dashboard feed
+            models.Index(fields=['user', '-date', '-id'], name='meallog_user_date_id_idx'),
+        ]
+
     def __str__(self): # String representation of the meal log
         return f"{self.user.username} - {self.meal_type} on {self.date}"
     
+# Per-user, per-day rollup of the logs above, kept in step with them by the signals in signals.py
+class DailySummary(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_summaries')
+    date = models.DateField()
+    calories_in = models.IntegerField(default=0)
+    calories_burned = models.IntegerField(default=0)
+    workout_count = models.IntegerField(default=0)
+    breakfast_count = models.IntegerField(default=0)
+    lunch_count = models.IntegerField(default=0)
+    dinner_count = models.IntegerField(default=0)
+    snack_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='dailysummary_user_date_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - summary for {self.date}"
+
 ############################## Wolf Pack Management #################################
 # Group Model
 class Group(models.Model):
@@ -85,6 +137,12 @@ class Group(models.Model):
     description = models.TextField(blank=True) # Optional description
     created_at = models.DateTimeField(auto_now_add=True) # Creation timestamp
     members = models.ManyToManyField(User, related_name='custom_groups', blank=True) # Many-to-many relationship with User
+    member_count = models.PositiveIntegerField(default=0) # Kept in sync by the m2m_changed signal in signals.py
+
+    class Meta:
+        indexes = [
+            models.Index(Lower('name'), name='group_name_lower_idx'), # Directory order and name-prefix search
+        ]
 
     def __str__(self): # String representation
         return self.name
@@ -96,9 +154,32 @@ class Message(models.Model): # Group chat message model
     content = models.TextField()  
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [ # Serves "latest N messages" and "messages since" for one pack
+            models.Index(fields=['group', 'timestamp'], name='message_group_timestamp_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} in {self.group.name}: {self.content[:20]}"
-    
+
+# Chat older than MESSAGE_ARCHIVE_DAYS, moved out of Message by `archive_messages`: one zlib-compressed NDJSON blob
+# per pack and month (see my_app/archive.py), read back page by page when someone scrolls past the hot table
+class MessageArchive(models.Model):
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='message_archives')
+    month = models.DateField() # First day of the month
+    first_id = models.BigIntegerField() # Lowest and highest Message id in the blob, for "load older" cursors
+    last_id = models.BigIntegerField()
+    message_count = models.PositiveIntegerField()
+    data = models.BinaryField()
+    authors = models.ManyToManyField(User, related_name='archived_messages') # Finds a user's lines for exports and account deletion
+    updated_at = models.DateTimeField(auto_now=True) # Part of the decompressed-month cache key
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['group', 'month'], name='message_archive_group_month')]
+
+    def __str__(self):
+        return f"{self.group.name} {self.month:%Y-%m} ({self.message_count} messages)"
+
 ############### Challenges and Badges ###############
 from django.db import models
 from django.contrib.auth.models import User
@@ -125,4 +206,94 @@ class Badge(models.Model):
 class UserBadge(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     badge = models.ForeignKey(Badge, on_delete=models.CASCADE)
-    awarded_at = models.DateTimeField(default=timezone.now)
\ No newline at end of file
+    awarded_at = models.DateTimeField(default=timezone.now)
+
+# Per-user counters and activity bitmap the badge engine evaluates rules against, so awarding never rescans history
+class BadgeProgress(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='badge_progress')
+    workout_count = models.PositiveIntegerField(default=0)
+    group_count = models.PositiveIntegerField(default=0)
+    activity = models.BinaryField(default=bytes, blank=True) # One bit per day with a workout, see streaks.ActivityBitmap
+    activity_origin = models.DateField(null=True, blank=True) # Day of bit 0
+    awarded = models.JSONField(default=list, blank=True) # Names of badges already awarded to the user
+
+    def __str__(self):
+        return f"{self.user.username}'s Badge Progress"
+
+    @property
+    def activity_bitmap(self): # A fresh copy; assign it back after changing it
+        return ActivityBitmap.from_bytes(self.activity, self.activity_origin)
+
+    @activity_bitmap.setter
+    def activity_bitmap(self, bitmap):
+        self.activity, self.activity_origin = bitmap.to_bytes(), bitmap.origin
+
+    def current_streak(self, today=None):
+        return self.activity_bitmap.current_streak(today or timezone.localdate())
+
+    @property
+    def longest_streak(self):
+        return self.activity_bitmap.longest_streak()
+
+############################## Leaderboards ##############################
+# Materialized per-user totals for each week, month and all time, refreshed by background tasks so rankings are read
+# from this table alone. Pack leaderboards are the same rows filtered to the pack's members.
+class LeaderboardEntry(models.Model):
+    PERIOD_CHOICES = [
+        ('week', 'This Week'),
+        ('month', 'This Month'),
+        ('all', 'All Time'),
+    ]
+    ALL_TIME_START = date(1970, 1, 1) # period_start of every all-time row
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    period_start = models.DateField() # Monday of the week, first of the month, or ALL_TIME_START
+    calories_burned = models.IntegerField(default=0)
+    workout_count = models.IntegerField(default=0)
+    best_streak = models.PositiveIntegerField(default=0) # Longest run of workout days inside the period
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'period', 'period_start'], name='leaderboard_user_period_unique'),
+        ]
+        indexes = [ # One per ranking, so top-K is an index range scan
+            models.Index(fields=['period', 'period_start', '-calories_burned'], name='leaderboard_calories_idx'),
+            models.Index(fields=['period', 'period_start', '-workout_count'], name='leaderboard_workouts_idx'),
+            models.Index(fields=['period', 'period_start', '-best_streak'], name='leaderboard_streak_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.period} from {self.period_start}"
+
+############################## Background Tasks ##############################
+# Deferred side effects (badges, rollups, leaderboards), written in the same transaction as the change that caused
+# them and run by `manage.py run_task_worker`. See tasks.py.
+class Task(models.Model):
+    QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100) # Registered task name
+    kwargs = models.JSONField(default=dict, blank=True)
+    idempotency_key = models.CharField(max_length=200, unique=True, null=True, blank=True) # Enqueuing the same key twice is a no-op
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now) # Pushed back between retries
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='task_status_run_after_idx'), # Claiming due work
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
@@ -0,0 +1,76 @@
+import functools
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.template.base import Template
+from django.template.loader_tags import BlockNode, IncludeNode
+
+# Times every template, {% block %} and {% include %} rendered while a RenderProfile is active. The hooks are
+# installed once at startup and cost a ContextVar lookup when no profile is active, so only requests sampled
+# by InstrumentationMiddleware (and template_bench) pay for the timing.
+
+_active = ContextVar('render_profile', default=None)
+_installed = False
+
+class RenderProfile:
+    def __init__(self):
+        self.entries = defaultdict(lambda: [0, 0.0, 0.0]) # (kind, name) -> [renders, inclusive seconds, self seconds]
+        self._children = [] # Inclusive time of finished children, per node being rendered
+        self.total = 0.0 # Wall time of the outermost renders
+
+    def timed(self, key, render, *args):
+        start = time.perf_counter()
+        self._children.append(0.0)
+        try:
+            return render(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            entry = self.entries[key]
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] += elapsed - self._children.pop()
+            if self._children:
+                self._children[-1] += elapsed
+            else:
+                self.total += elapsed
+
+    def slowest(self, limit=5): # [(kind, name, renders, inclusive, self)] by self time
+        rows = [(kind, name, calls, inclusive, own) for (kind, name), (calls, inclusive, own) in self.entries.items()]
+        return sorted(rows, key=lambda row: row[4], reverse=True)[:limit]
+
+class profile_renders: # Context manager activating a RenderProfile for the code inside it
+    def __enter__(self):
+        self.profile = RenderProfile()
+        self._token = _active.set(self.profile)
+        return self.profile
+
+    def __exit__(self, *exc_info):
+        _active.reset(self._token)
+
+def _template_name(template, context):
+    return template.origin.template_name or template.name or '<string>'
+
+def _block_name(node, context): # Named after the template being rendered, which is where an overriding block lives
+    return f"{node.name} ({context.template.origin.template_name})"
+
+def _include_name(node, context):
+    return str(getattr(node.template, 'var', node.template))
+
+def _wrap(kind, name_of, render):
+    @functools.wraps(render)
+    def wrapper(self, context, *args):
+        profile = _active.get()
+        if profile is None:
+            return render(self, context, *args)
+        return profile.timed((kind, name_of(self, context)), render, self, context, *args)
+    return wrapper
+
+def install(): # Called from AppConfig.ready() when settings.TEMPLATE_PROFILING is on
+    global _installed
+    if _installed:
+        return
+    Template._render = _wrap('template', _template_name, Template._render)
+    BlockNode.render = _wrap('block', _block_name, BlockNode.render)
+    IncludeNode.render = _wrap('include', _include_name, IncludeNode.render)
+    _installed = True
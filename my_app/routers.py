@@ -0,0 +1,52 @@
+from contextvars import ContextVar
+
+# Read-replica routing (settings.REPLICA_DB). Reads only go to the replica inside views marked with @replica_reads,
+# and only for this app's models: sessions and users stay on the primary, since a lagging copy of those would log
+# people out or hide a fresh sign-up. Any write pins the rest of the request to the primary, and
+# ReplicaStickinessMiddleware keeps the writer's browser pinned for REPLICA_STICKY_SECONDS so they read their writes.
+
+REPLICA = 'replica'
+REPLICA_APPS = {'my_app'}
+
+_state = ContextVar('replica_routing', default=None)
+
+class RoutingState: # One per request, shared by reference with the threads sync_to_async runs its ORM calls on
+    __slots__ = ('replica', 'pinned', 'wrote')
+
+    def __init__(self, pinned=False):
+        self.replica = False # The view opted in with @replica_reads
+        self.pinned = pinned # Recent write by this client, or a write earlier in this request
+        self.wrote = False
+
+def replica_reads(view): # Mark a read-mostly view as safe to serve from the replica
+    view.replica_reads = True
+    return view
+
+def current_state():
+    return _state.get()
+
+def begin_request(pinned):
+    state = RoutingState(pinned)
+    return state, _state.set(state)
+
+def end_request(token):
+    _state.reset(token)
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.replica or state.pinned or model._meta.app_label not in REPLICA_APPS:
+            return None # Falls through to 'default'
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.pinned = state.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True # Same data on both aliases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA # The replica gets its schema from replication (or sync_replica for SQLite)
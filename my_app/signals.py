@@ -1,13 +1,74 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
-from django.contrib.auth.models import User
-from .models import Profile
+from .models import User, Profile, Workout, MealLog, Group, Badge, UserBadge
+from . import badges, caching, directory, tasks
 
 @receiver(post_save, sender=User) # This signal is triggered after a User instance is saved.
 def create_profile(sender, instance, created, **kwargs):
+    if created: # Only on sign-up; later saves (e.g. last_login on every login) never touch the profile
+        Profile.objects.get_or_create(user=instance)
+
+############################## Deferred Side Effects ##############################
+# Badge progress, daily summaries and leaderboards are updated by background tasks (tasks.py) queued in the same
+# transaction as the change, so logging views only pay for one INSERT. Edits are rare (admin only) and are
+# reconciled by backfill_daily_summaries.
+def _enqueue_log_change(sender, instance, event): # The key makes a repeated signal for one row a no-op
+    name = 'workout_changed' if sender is Workout else 'meal_changed'
+    tasks.enqueue(name, key=f"{name}:{instance.pk}:{event}", user_id=instance.user_id, day=instance.date.isoformat())
+
+@receiver(post_save, sender=Workout)
+@receiver(post_save, sender=MealLog)
+def log_created(sender, instance, created, **kwargs):
     if created:
-        Profile.objects.create(user=instance)
+        _enqueue_log_change(sender, instance, 'created')
+
+@receiver(post_delete, sender=Workout)
+@receiver(post_delete, sender=MealLog)
+def log_deleted(sender, instance, **kwargs):
+    _enqueue_log_change(sender, instance, 'deleted')
+
+############################## Per-User Cache Invalidation ##############################
+@receiver(post_save, sender=Workout)
+@receiver(post_save, sender=MealLog)
+@receiver(post_save, sender=UserBadge)
+@receiver(post_delete, sender=Workout)
+@receiver(post_delete, sender=MealLog)
+@receiver(post_delete, sender=UserBadge)
+def user_data_changed(sender, instance, **kwargs): # Orphans the user's cached dashboard, routine, challenges and analytics
+    caching.bump_generation(instance.user_id)
+
+############################## Pack Membership ##############################
+@receiver(m2m_changed, sender=Group.members.through) # Joining or leaving a pack
+def pack_membership_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove'):
+        return
+    user_ids = [instance.pk] if reverse else pk_set
+    for user_id in user_ids: # Badge progress for the pack count is updated off the request path
+        tasks.enqueue('membership_changed', user_id=user_id)
+
+@receiver(m2m_changed, sender=Group.members.through) # Keep Group.member_count current
+def pack_member_count(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_add' and pk_set:
+        directory.members_added(pk_set if reverse else [instance.pk], 1 if reverse else len(pk_set))
+    elif action == 'post_remove':
+        directory.recount_members(pk_set if reverse else [instance.pk])
+    elif action == 'pre_clear' and reverse: # user.custom_groups.clear()
+        directory.members_left(instance.custom_groups.values_list('id', flat=True))
+    elif action == 'post_clear' and not reverse: # group.members.clear()
+        Group.objects.filter(pk=instance.pk).update(member_count=0)
+
+@receiver(pre_delete, sender=User) # Membership rows cascade away without m2m_changed
+def member_deleted(sender, instance, **kwargs):
+    directory.members_left(instance.custom_groups.values_list('id', flat=True))
+
+@receiver(post_save, sender=Badge) # Keep the in-memory badge catalog in sync with the table
+@receiver(post_delete, sender=Badge)
+def badge_catalog_changed(sender, **kwargs):
+    badges.invalidate_catalog()
 
-@receiver(post_save, sender=User) 
-def save_profile(sender, instance, **kwargs):
-    instance.profile.save()
\ No newline at end of file
+############################## Message Archive ##############################
+@receiver(pre_delete, sender=User) # Archived chat isn't covered by the Message CASCADE, so its lines are scrubbed in the background
+def archived_author_deleted(sender, instance, **kwargs):
+    archive_ids = list(instance.archived_messages.values_list('id', flat=True))
+    if archive_ids:
+        tasks.enqueue('archived_author_deleted', user_id=instance.pk, archive_ids=archive_ids)
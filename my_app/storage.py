@@ -0,0 +1,39 @@
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try: # Brotli is optional; without it only .gz copies are written
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_EXTENSIONS = ('.css', '.js', '.json', '.svg', '.txt', '.map', '.html', '.xml')
+
+def compressed_copies(data): # {suffix: bytes} for the encodings that actually save space
+    copies = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)} # mtime=0 keeps rebuilds byte-identical
+    if brotli is not None:
+        copies['.br'] = brotli.compress(data, quality=11)
+    return {suffix: body for suffix, body in copies.items() if len(body) < len(data) * 0.95}
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # collectstatic writes content-hashed copies (styles.3f2a9c.css) plus .gz/.br siblings, which
+    # my_app.assets.serve_static picks by Accept-Encoding and serves with far-future cache headers
+
+    def stored_name(self, name):
+        if not self.hashed_files: # Nothing collected yet (development checkouts, tests): use the source name
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in paths:
+            if not name.endswith(COMPRESS_EXTENSIONS):
+                continue
+            for stored in {name, self.hashed_files.get(self.hash_key(self.clean_name(name)), name)}:
+                with self.open(stored) as source:
+                    data = source.read()
+                for suffix, body in compressed_copies(data).items():
+                    with open(self.path(stored + suffix), 'wb') as target:
+                        target.write(body)
@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+############################## Activity Bitmap ##############################
+# One bit per calendar day, bit 0 being `origin`. A year of history is 46 bytes, and every streak question below
+# is a handful of integer operations on it instead of a date-range query that grows with the streak length.
+class ActivityBitmap:
+    def __init__(self, bits=0, origin=None):
+        self.bits = bits
+        self.origin = origin if bits else None
+
+    @classmethod
+    def from_bytes(cls, data, origin): # BinaryField values may come back as memoryview
+        return cls(int.from_bytes(bytes(data or b''), 'little'), origin)
+
+    @classmethod
+    def from_days(cls, days):
+        bitmap = cls()
+        for day in days:
+            bitmap.add(day)
+        return bitmap
+
+    def to_bytes(self):
+        return self.bits.to_bytes((self.bits.bit_length() + 7) // 8, 'little')
+
+    def _index(self, day):
+        return (day - self.origin).days
+
+    @property
+    def last_day(self):
+        return self.origin + timedelta(days=self.bits.bit_length() - 1) if self.bits else None
+
+    def __contains__(self, day):
+        return bool(self.bits) and 0 <= self._index(day) and self.bits >> self._index(day) & 1
+
+    def add(self, day):
+        if not self.bits:
+            self.bits, self.origin = 1, day
+            return
+        index = self._index(day)
+        if index < 0: # Earlier than anything seen so far: move the origin back
+            self.bits <<= -index
+            self.origin, index = day, 0
+        self.bits |= 1 << index
+
+    def discard(self, day):
+        if day in self:
+            self.bits &= ~(1 << self._index(day))
+            if not self.bits:
+                self.origin = None
+
+    ############################## Queries ##############################
+    def streak_ending(self, day): # Consecutive active days ending on `day`
+        if day not in self:
+            return 0
+        index = self._index(day)
+        gaps = ~self.bits & ((1 << (index + 1)) - 1) # Inactive days up to and including `day`
+        return index + 1 if not gaps else index - (gaps.bit_length() - 1)
+
+    def current_streak(self, today): # A streak stays current until a whole day passes without a workout
+        return self.streak_ending(today) or self.streak_ending(today - timedelta(days=1))
+
+    def _window(self, start, end): # Only the bits for days in [start, end]; either bound may be None
+        bits = self.bits
+        if bits and start is not None and self._index(start) > 0:
+            bits &= ~((1 << self._index(start)) - 1)
+        if bits and end is not None:
+            bits = bits & ((1 << (self._index(end) + 1)) - 1) if self._index(end) >= 0 else 0
+        return bits
+
+    def longest_streak(self, start=None, end=None): # Longest run of active days, optionally within [start, end]
+        # Each step keeps only the bits that still have an active day after them, so the loop runs once per day
+        # of the longest run rather than once per day of history
+        bits, length = self._window(start, end), 0
+        while bits:
+            bits &= bits >> 1
+            length += 1
+        return length
+
+    def days_active(self, start, end): # Active days in [start, end]
+        return self._window(start, end).bit_count() if end >= start else 0
@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from .models import DailySummary, MealLog, Workout
+
+MEAL_COUNT_FIELDS = { # MealLog.meal_type -> DailySummary counter
+    'Breakfast': 'breakfast_count',
+    'Lunch': 'lunch_count',
+    'Dinner': 'dinner_count',
+    'Snack': 'snack_count',
+}
+
+############################## Per-Day Refresh ##############################
+def refresh_day(user_id, day): # Recompute one day's row from that day's logs; safe to repeat or run out of order
+    meal_counts = {field: Count('id', filter=Q(meal_type=meal_type)) for meal_type, field in MEAL_COUNT_FIELDS.items()}
+    workouts = Workout.objects.filter(user_id=user_id, date=day).aggregate(calories_burned=Sum('calories_burned'), workout_count=Count('id'))
+    meals = MealLog.objects.filter(user_id=user_id, date=day).aggregate(calories_in=Sum('calories'), meal_count=Count('id'), **meal_counts)
+    meal_count = meals.pop('meal_count')
+    if not workouts['workout_count'] and not meal_count: # Nothing left that day
+        DailySummary.objects.filter(user_id=user_id, date=day).delete()
+        return
+    values = {field: value or 0 for field, value in {**workouts, **meals}.items()}
+    DailySummary.objects.update_or_create(user_id=user_id, date=day, defaults=values)
+
+def summary_for(user, day): # Saved row for the day, or an empty unsaved one when nothing was logged
+    return DailySummary.objects.filter(user=user, date=day).first() or DailySummary(user=user, date=day)
+
+
+############################## Backfill ##############################
+def rebuild_daily_summaries(users=None): # Recompute rollups from the raw logs; returns the number of rows written
+    meals = MealLog.objects.all()
+    workouts = Workout.objects.all()
+    summaries = DailySummary.objects.all()
+    if users is not None:
+        meals, workouts, summaries = meals.filter(user__in=users), workouts.filter(user__in=users), summaries.filter(user__in=users)
+
+    rows = {}
+    def row(user_id, day):
+        if (user_id, day) not in rows:
+            rows[user_id, day] = DailySummary(user_id=user_id, date=day)
+        return rows[user_id, day]
+
+    meal_counts = {field: Count('id', filter=Q(meal_type=meal_type)) for meal_type, field in MEAL_COUNT_FIELDS.items()}
+    for totals in meals.values('user_id', 'date').annotate(calories_in=Sum('calories'), **meal_counts).order_by():
+        summary = row(totals['user_id'], totals['date'])
+        summary.calories_in = totals['calories_in']
+        for field in MEAL_COUNT_FIELDS.values():
+            setattr(summary, field, totals[field])
+
+    for totals in workouts.values('user_id', 'date').annotate(calories_burned=Sum('calories_burned'), workout_count=Count('id')).order_by():
+        summary = row(totals['user_id'], totals['date'])
+        summary.calories_burned = totals['calories_burned']
+        summary.workout_count = totals['workout_count']
+
+    with transaction.atomic():
+        summaries.delete()
+        DailySummary.objects.bulk_create(rows.values(), batch_size=1000)
+    return len(rows)
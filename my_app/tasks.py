@@ -0,0 +1,151 @@
+import logging
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Callable
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from . import archive, avatars, badges, caching, leaderboards, summaries
+from .metrics import registry
+from .models import Group, Task
+
+logger = logging.getLogger(__name__)
+
+############################## Task Registry ##############################
+TASKS = {} # Task name -> TaskSpec
+
+@dataclass(frozen=True)
+class TaskSpec:
+    name: str
+    func: Callable
+    max_attempts: int
+
+def task(name, max_attempts=5): # Decorator registering a function the worker can run by name
+    def register(func):
+        TASKS[name] = TaskSpec(name, func, max_attempts)
+        return func
+    return register
+
+def enqueue(name, key=None, **kwargs): # kwargs must be JSON-serializable; a repeated key returns the existing task
+    spec = TASKS[name]
+    if settings.TASKS_EAGER: # Development without a worker: run inline, as before the queue existed
+        # After commit, like a worker would: inside a cascade delete the task would re-create the user's rollups
+        transaction.on_commit(lambda: spec.func(**kwargs))
+        return None
+    fields = {'name': name, 'kwargs': kwargs, 'max_attempts': spec.max_attempts}
+    if key is None:
+        return Task.objects.create(**fields)
+    queued, _ = Task.objects.get_or_create(idempotency_key=key, defaults=fields)
+    return queued
+
+############################## Worker Side ##############################
+def claim_tasks(limit): # Mark up to `limit` due tasks as running and return them
+    now = timezone.now()
+    lease_expired = now - timedelta(seconds=settings.TASK_LEASE_SECONDS) # A worker died mid-task
+    due = Q(status=Task.QUEUED, run_after__lte=now) | Q(status=Task.RUNNING, started_at__lt=lease_expired)
+    with transaction.atomic(): # SKIP LOCKED lets several workers claim side by side on PostgreSQL
+        ids = list(
+            Task.objects.select_for_update(skip_locked=True).filter(due)
+            .order_by('run_after', 'id').values_list('id', flat=True)[:limit]
+        )
+        Task.objects.filter(id__in=ids).update(status=Task.RUNNING, started_at=now, attempts=F('attempts') + 1)
+    return list(Task.objects.filter(id__in=ids).order_by('run_after', 'id'))
+
+def run_task(claimed): # Returns True on success; failures are retried with exponential backoff
+    spec = TASKS.get(claimed.name)
+    try:
+        if spec is None:
+            raise LookupError(f"Unknown task {claimed.name!r}")
+        with transaction.atomic(): # The work and its "done" mark commit together, so a success is never re-run
+            spec.func(**claimed.kwargs)
+            Task.objects.filter(pk=claimed.pk).update(status=Task.DONE, finished_at=timezone.now(), last_error='')
+        return True
+    except Exception as error:
+        retry = spec is not None and claimed.attempts < claimed.max_attempts
+        delay = settings.TASK_RETRY_SECONDS * 2 ** (claimed.attempts - 1)
+        Task.objects.filter(pk=claimed.pk).update(
+            status=Task.QUEUED if retry else Task.FAILED,
+            run_after=timezone.now() + timedelta(seconds=delay),
+            finished_at=None if retry else timezone.now(),
+            last_error=f"{type(error).__name__}: {error}",
+        )
+        logger.warning("Task %s #%d failed (attempt %d)%s", claimed.name, claimed.pk, claimed.attempts, ", retrying" if retry else "", exc_info=True)
+        return False
+
+def purge_finished(): # Done tasks are only kept long enough to report latency and dedupe late repeats
+    cutoff = timezone.now() - timedelta(seconds=settings.TASK_RETENTION_SECONDS)
+    return Task.objects.filter(status=Task.DONE, finished_at__lt=cutoff).delete()[0]
+
+############################## Queue Metrics ##############################
+LATENCY_WINDOW = timedelta(minutes=5)
+
+def queue_stats(): # Read from the table, so any web process can report on every worker
+    now = timezone.now()
+    counts = dict(Task.objects.values_list('status').annotate(total=Count('id')).order_by())
+    oldest = Task.objects.filter(status=Task.QUEUED, run_after__lte=now).order_by('run_after').values_list('created_at', flat=True).first()
+    recent = list(
+        Task.objects.filter(status=Task.DONE, finished_at__gte=now - LATENCY_WINDOW)
+        .values_list('created_at', 'started_at', 'finished_at')[:1000]
+    )
+    latency = sum((finished - created).total_seconds() for created, _, finished in recent) / len(recent) if recent else 0.0
+    run_time = sum((finished - started).total_seconds() for _, started, finished in recent) / len(recent) if recent else 0.0
+    return {
+        'queued': counts.get(Task.QUEUED, 0),
+        'running': counts.get(Task.RUNNING, 0),
+        'failed': counts.get(Task.FAILED, 0),
+        'oldest_seconds': (now - oldest).total_seconds() if oldest else 0.0,
+        'latency_seconds': latency,
+        'run_seconds': run_time,
+    }
+
+def publish_queue_metrics(): # Called by the /metrics/ view right before rendering
+    stats = queue_stats()
+    registry.set_gauge('wolf_task_queue_depth', "Tasks waiting to run.", stats['queued'])
+    registry.set_gauge('wolf_task_running', "Tasks claimed by a worker.", stats['running'])
+    registry.set_gauge('wolf_task_failed', "Tasks that used up their retries.", stats['failed'])
+    registry.set_gauge('wolf_task_oldest_wait_seconds', "Age of the oldest due task still queued.", f"{stats['oldest_seconds']:.3f}")
+    registry.set_gauge('wolf_task_latency_seconds', "Mean enqueue-to-finish time over the last 5 minutes.", f"{stats['latency_seconds']:.3f}")
+    registry.set_gauge('wolf_task_run_seconds', "Mean run time over the last 5 minutes.", f"{stats['run_seconds']:.3f}")
+
+############################## Tasks ##############################
+def _user_exists(user_id): # The user may have deleted their account since the task was queued
+    return get_user_model().objects.filter(pk=user_id).exists()
+
+# Log tasks carry only (user, day) and recompute that day from the raw rows, so they stay correct when retried,
+# duplicated by a reclaimed lease, or run in a different order than the changes happened
+@task('workout_changed')
+def workout_changed(user_id, day):
+    if not _user_exists(user_id):
+        return
+    day = date.fromisoformat(day)
+    summaries.refresh_day(user_id, day)
+    badges.refresh_workout_day(user_id, day)
+    leaderboards.refresh_periods(user_id, day) # Reads the two above
+    caching.bump_generation(user_id) # Pages cached between the request and now have stale totals
+
+@task('meal_changed')
+def meal_changed(user_id, day):
+    if not _user_exists(user_id):
+        return
+    summaries.refresh_day(user_id, date.fromisoformat(day))
+    caching.bump_generation(user_id)
+
+@task('membership_changed')
+def membership_changed(user_id): # Recounts, so duplicates and reordering are harmless
+    if not _user_exists(user_id):
+        return
+    badges.record_group_change(user_id, Group.members.through.objects.filter(user_id=user_id).count())
+
+@task('avatar_uploaded', max_attempts=3)
+def avatar_uploaded(user_id, sha256): # Thumbnails are named by content, so a retry just overwrites them
+    if not _user_exists(user_id):
+        return
+    avatars.process_avatar(user_id, sha256)
+
+@task('archived_author_deleted')
+def archived_author_deleted(user_id, archive_ids): # Rewrites only the months the account wrote in
+    archive.remove_author(user_id, archive_ids)
@@ -0,0 +1,31 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+from ..assets import responsive_variants
+from ..avatars import thumbnail_url, user_thumbnail
+
+register = template.Library()
+
+def _srcset(variants):
+    return ', '.join(f"{static(name)} {width}w" for name, width in variants)
+
+@register.simple_tag
+def responsive_image(name, alt='', css_class='', sizes='100vw', loading='lazy'):
+    # <picture> with WebP and JPEG srcsets from build_assets; a plain <img> until the variants are built
+    variants = responsive_variants(name)
+    if variants is None:
+        return format_html('<img src="{}" class="{}" alt="{}" loading="{}" decoding="async">', static(name), css_class, alt, loading)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" class="{}" alt="{}" loading="{}" decoding="async"></picture>',
+        _srcset(variants['webp']), sizes,
+        static(variants['jpeg'][-1][0]), _srcset(variants['jpeg']), sizes,
+        variants['width'], variants['height'], css_class, alt, loading,
+    )
+
+@register.filter
+def avatar_url(value, size=None): # {{ user|avatar_url }} or {{ avatar|avatar_url:128 }}; '' without a picture
+    if hasattr(value, 'sha256'):
+        return thumbnail_url(value.sha256, size)
+    return user_thumbnail(value, size) or ''
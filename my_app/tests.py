@@ -1,3 +1,891 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import io
+import itertools
+import json
+import os
+import tempfile
+from datetime import date, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import Http404, HttpResponse
+from django.template import Context, Engine
+from django.template.base import Template
+from django.template.loader_tags import BlockNode, IncludeNode
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import analytics, assets, async_views, avatars, badges, caching, catalog, chat, checks, directory, leaderboards, render_profiler, summaries, tasks, views
+from .archive import archive_messages
+from .benchmarks import check_results, format_results, load_baseline, run_benchmarks
+from .importers import import_rows, iter_json_rows, iter_rows
+from .metrics import LATENCY_BUCKETS, registry
+from .middleware import InstrumentationMiddleware, ReplicaStickinessMiddleware
+from .models import Badge, BadgeProgress, DailySummary, Group, LeaderboardEntry, MealLog, Message, MessageArchive, Profile, Task, User, UserBadge, Workout, profile_for
+from .streaks import ActivityBitmap
+from .routers import REPLICA, PrimaryReplicaRouter, current_state, replica_reads
+from .utils import decode_cursor, keyset_page
+
+
+# Dashboard feeds page on (date, id), so rows sharing a date are neither repeated nor skipped
+class KeysetPaginationTests(TestCase):
+    def test_cursor_round_trip_breaks_date_ties_by_id(self):
+        user = User.objects.create_user('howler')
+        days = [date(2025, 4, 25), date(2025, 4, 25), date(2025, 4, 25), date(2025, 4, 24), date(2025, 4, 26)]
+        workouts = [Workout.objects.create(user=user, date=day, workout_type="Running", duration=30, calories_burned=200) for day in days]
+        expected = sorted(workouts, key=lambda workout: (workout.date, workout.id), reverse=True)
+
+        seen, cursor = [], None
+        while True:
+            rows, cursor = keyset_page(Workout.objects.filter(user=user), cursor, page_size=2)
+            seen += rows
+            if cursor is None:
+                break
+            self.assertEqual(decode_cursor(cursor), (rows[-1].date, rows[-1].id))
+        self.assertEqual(seen, expected)
+
+        with self.assertRaises(ValueError):
+            keyset_page(Workout.objects.filter(user=user), "not-a-cursor")
+
+
+# Badge rules run against the stored progress counters, and a repeated refresh never awards a badge twice
+class BadgeEngineTests(TestCase):
+    def test_streak_and_count_badges_are_awarded_once(self):
+        user = User.objects.create_user('howler')
+        start = date(2025, 3, 1)
+        for offset in range(5): # Five days in a row (the queued tasks aren't run, so refresh by hand)
+            day = start + timedelta(days=offset)
+            Workout.objects.create(user=user, date=day, workout_type="Running", duration=30, calories_burned=200)
+            badges.refresh_workout_day(user.id, day)
+        badges.refresh_workout_day(user.id, start) # A retried task
+
+        awarded = list(UserBadge.objects.filter(user=user).values_list('badge__name', flat=True))
+        self.assertEqual(awarded, ["🔥 5-Day Streak"])
+        progress = BadgeProgress.objects.get(user=user)
+        self.assertEqual((progress.workout_count, progress.longest_streak), (5, 5))
+
+        badges.record_group_change(user.id, 1)
+        self.assertEqual(UserBadge.objects.filter(user=user).count(), 2) # Pack Leader
+
+
+# The badge catalog is read once per process and reloaded only when a Badge row changes
+class BadgeCatalogTests(TestCase):
+    def test_catalog_is_cached_until_a_badge_changes(self):
+        badges.invalidate_catalog()
+        self.addCleanup(badges.invalidate_catalog) # Don't leak ids from this test's rolled-back rows
+        catalog = badges.badge_catalog()
+        self.assertLessEqual(set(badges.BADGE_RULES), set(catalog))
+        with self.assertNumQueries(0):
+            self.assertIs(badges.badge_catalog(), catalog)
+
+        badge = Badge.objects.create(name="🌑 New Moon", description="Howl at a new moon.", emoji="🌑")
+        self.assertEqual(badges.badge_catalog()[badge.name], badge.id)
+
+
+# A day's rollup is recomputed from that day's logs, so repeating or reordering refreshes can't drift
+class DailySummaryTests(TestCase):
+    def test_refresh_day_totals_and_removal(self):
+        user = User.objects.create_user('howler')
+        day = date(2025, 5, 1)
+        Workout.objects.create(user=user, date=day, workout_type="Running", duration=30, calories_burned=250)
+        Workout.objects.create(user=user, date=day, workout_type="Rowing", duration=20, calories_burned=150)
+        MealLog.objects.create(user=user, date=day, meal_name="Oats", meal_type="Breakfast", calories=300)
+        MealLog.objects.create(user=user, date=day + timedelta(days=1), meal_name="Stew", meal_type="Dinner", calories=700)
+
+        summaries.refresh_day(user.id, day)
+        summaries.refresh_day(user.id, day)
+        summary = DailySummary.objects.get(user=user, date=day)
+        self.assertEqual((summary.calories_in, summary.calories_burned, summary.workout_count), (300, 400, 2))
+        self.assertEqual((summary.breakfast_count, summary.dinner_count), (1, 0))
+
+        Workout.objects.filter(user=user, date=day).delete()
+        MealLog.objects.filter(user=user, date=day).delete()
+        summaries.refresh_day(user.id, day)
+        self.assertFalse(DailySummary.objects.filter(user=user, date=day).exists())
+        self.assertEqual(summaries.summary_for(user, day).calories_in, 0) # Unsaved empty row for the routine page
+
+
+# Chat posts are broadcast to the whole pack, so only members may send them
+class ChatPostingTests(TestCase):
+    def test_non_members_cannot_post(self):
+        member, outsider = User.objects.create_user('howler'), User.objects.create_user('stray')
+        group = Group.objects.create(name="Moon Pack")
+        group.members.add(member)
+
+        for user, status in ((outsider, 403), (member, 302)):
+            request = RequestFactory().post('/', {'message': f"hello from {user.username}"})
+            request.user = user
+            self.assertEqual(views.group_detail(request, group.id).status_code, status) # The sync view (WOLF_ASYNC_VIEWS=0)
+        self.assertEqual(list(Message.objects.values_list('content', flat=True)), ["hello from howler"])
+
+
+# Pack chat sockets only open for members on this site, and carry posts both ways
+class ChatSocketTests(TestCase):
+    def setUp(self):
+        self.member, self.other, self.stray = [User.objects.create_user(name) for name in ('howler', 'runner', 'stray')]
+        self.group = Group.objects.create(name="Moon Pack")
+        self.group.members.add(self.member, self.other)
+        self.sockets = []
+
+    async def connect(self, user=None, origin=None):
+        headers = [(b'origin', origin.encode())] if origin else []
+        if user is not None:
+            await self.async_client.aforce_login(user)
+            headers.append((b'cookie', f"{settings.SESSION_COOKIE_NAME}={self.async_client.cookies[settings.SESSION_COOKIE_NAME].value}".encode()))
+        socket = ApplicationCommunicator(chat.websocket_application, {'type': 'websocket', 'path': f"/ws/groups/{self.group.id}/", 'headers': headers})
+        await socket.send_input({'type': 'websocket.connect'})
+        return socket, await socket.receive_output(timeout=5)
+
+    async def open(self, user):
+        subscribers = chat.broker.subscriber_count(chat.group_channel(self.group.id))
+        socket, event = await self.connect(user, origin="http://testserver")
+        self.assertEqual(event['type'], 'websocket.accept')
+        while chat.broker.subscriber_count(chat.group_channel(self.group.id)) == subscribers: # relay() subscribes after accepting
+            await asyncio.sleep(0.01)
+        self.sockets.append(socket)
+        return socket
+
+    async def close_all(self): # Disconnecting ends relay() and drops the broker subscription
+        for socket in self.sockets:
+            await socket.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await socket.wait(timeout=5)
+        self.assertEqual(chat.broker.subscriber_count(chat.group_channel(self.group.id)), 0)
+
+    async def receive(self, socket):
+        return json.loads((await socket.receive_output(timeout=5))['text'])
+
+    async def test_member_receives_published_messages(self):
+        socket = await self.open(self.member)
+        await sync_to_async(chat.post_message)(self.group.id, self.other, "moonrise run at 9")
+        payload = await self.receive(socket)
+        self.assertEqual((payload['user'], payload['content']), ('runner', "moonrise run at 9"))
+        await self.close_all()
+
+    async def test_outsiders_are_closed(self):
+        for user in (None, self.stray):
+            socket, event = await self.connect(user)
+            self.assertEqual(event, {'type': 'websocket.close', 'code': 4403})
+        socket, event = await self.connect(self.member, origin="https://evil.example")
+        self.assertEqual(event, {'type': 'websocket.close', 'code': 4404})
+
+    async def test_posted_frames_are_saved_and_fanned_out(self):
+        sender, listener = await self.open(self.member), await self.open(self.other)
+        await sender.send_input({'type': 'websocket.receive', 'text': json.dumps({'content': "  first howl  "})})
+        payload = await self.receive(listener)
+        self.assertEqual((payload['user'], payload['content']), ('howler', "first howl"))
+        self.assertEqual((await self.receive(sender))['id'], payload['id']) # The sender sees its own post too
+        self.assertEqual([content async for content in Message.objects.values_list('content', flat=True)], ["first howl"])
+        await self.close_all()
+
+
+# Chat polling returns only what's newer than the client's cursor, a page at a time
+class ChatHistoryTests(TestCase):
+    def test_after_and_since_cursors(self):
+        user = User.objects.create_user('howler')
+        group = Group.objects.create(name="Moon Pack")
+        group.members.add(user)
+        messages = [Message.objects.create(group=group, user=user, content=f"howl {i}") for i in range(5)]
+        self.client.force_login(user)
+        url = reverse('group_messages', args=[group.id])
+
+        data = self.client.get(url, {'after': messages[1].id}).json()
+        self.assertEqual([message['id'] for message in data['messages']], [message.id for message in messages[2:]])
+        self.assertFalse(data['has_more'])
+
+        since = messages[3].timestamp.isoformat()
+        self.assertEqual([message['content'] for message in self.client.get(url, {'since': since}).json()['messages']], ["howl 4"])
+
+        with self.settings(CHAT_HISTORY_LIMIT=2):
+            data = self.client.get(url, {'after': 0}).json()
+        self.assertEqual((len(data['messages']), data['has_more']), (2, True))
+
+        self.assertEqual(self.client.get(url, {'since': "yesterday"}).status_code, 400)
+        self.client.force_login(User.objects.create_user('stray'))
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+# Imports report bad rows without stopping, and keep derived totals in step even when the file breaks partway
+class HistoryImportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('howler')
+
+    def workout(self, day, **fields):
+        return {'date': day.isoformat(), 'workout_type': "Running", 'duration': 30, 'calories_burned': 250, **fields}
+
+    def test_bad_rows_are_skipped_and_reported(self):
+        rows = [self.workout(date(2025, 1, 1)), self.workout(date(2025, 1, 2), duration="long"), "not a row", self.workout(date(2025, 1, 3))]
+        result = import_rows(self.user, 'workouts', rows)
+        self.assertEqual((result.imported, result.skipped), (2, 2))
+        self.assertEqual([number for number, _ in result.errors], [2, 3])
+        self.assertIn("duration", result.errors[0][1])
+        self.assertEqual(DailySummary.objects.filter(user=self.user).count(), 2)
+
+    def test_unreadable_tail_keeps_committed_batches_consistent(self):
+        text = json.dumps([self.workout(date(2025, 1, 1) + timedelta(days=i)) for i in range(25)])[:-1] + ', {"date": "2025-'
+        with self.assertRaises(ValueError):
+            import_rows(self.user, 'workouts', iter_rows(io.StringIO(text), 'json'), batch_size=10)
+        self.assertEqual(Workout.objects.filter(user=self.user).count(), 20) # Two full batches were committed
+        self.assertEqual(DailySummary.objects.filter(user=self.user).count(), 20)
+        self.assertEqual(BadgeProgress.objects.get(user=self.user).workout_count, 20)
+
+    def test_runaway_json_row_is_rejected(self):
+        class Endless: # Opens a row whose string never closes, and never reaches end of file
+            opened = False
+
+            def read(self, size):
+                if not self.opened:
+                    self.opened = True
+                    return '[{"workout_type": "'
+                return "x" * size
+
+        rows = iter_json_rows(Endless(), chunk_size=1024)
+        with mock.patch('my_app.importers.MAX_JSON_ROW_CHARS', 10_000), self.assertRaises(ValueError):
+            next(rows)
+
+
+# Exports stream block by block under WSGI and ASGI alike, instead of being read into memory first
+class HistoryExportTests(TestCase):
+    async def test_asgi_export_streams_asynchronously(self):
+        user = await User.objects.acreate_user('howler')
+        for i in range(3):
+            await Workout.objects.acreate(user=user, date=date(2025, 1, 1 + i), workout_type="Running", duration=30, calories_burned=200)
+        await self.async_client.aforce_login(user)
+
+        response = await self.async_client.get(reverse('export_history'), {'format': 'csv', 'dataset': 'workouts'})
+        self.assertTrue(response.is_async)
+        lines = b"".join([block async for block in response.streaming_content]).decode().splitlines()
+        self.assertEqual(lines[0], "date,workout_type,duration,sets,reps,calories_burned")
+        self.assertEqual(len(lines), 4)
+
+        await sync_to_async(self.client.force_login)(user) # WSGI keeps the plain generator
+        sync_response = await sync_to_async(self.client.get)(reverse('export_history'), {'format': 'csv', 'dataset': 'workouts'})
+        self.assertFalse(sync_response.is_async)
+
+
+# Trends are bucketed from the daily rollup with empty periods filled in, then smoothed by a trailing mean
+class AnalyticsTests(TestCase):
+    def test_weekly_trends_fill_gaps_and_smooth(self):
+        user = User.objects.create_user('howler')
+        DailySummary.objects.create(user=user, date=date(2025, 5, 5), calories_in=500, calories_burned=200, workout_count=1)
+        DailySummary.objects.create(user=user, date=date(2025, 5, 7), calories_in=300)
+        DailySummary.objects.create(user=user, date=date(2025, 5, 20), calories_in=900, calories_burned=400, workout_count=2)
+
+        trends = analytics.calorie_trends(user, 'week', date(2025, 5, 5), date(2025, 5, 25))
+        self.assertEqual([trend['period_start'] for trend in trends], ["2025-05-05", "2025-05-12", "2025-05-19"])
+        self.assertEqual([trend['net'] for trend in trends], [600, 0, 500])
+        self.assertEqual([trend['workouts'] for trend in trends], [1, 0, 2])
+
+        self.assertEqual(analytics.rolling_average([1, 2, 3, 4, 5], 2), [None, 1.5, 2.5, 3.5, 4.5])
+        self.assertEqual(analytics.rolling_average([4, 6], 1), [4.0, 6.0])
+
+    ROLLING_CASES = [([1, 2, 3, 4, 5], 2), ([3, 1, 4, 1, 5, 9, 2, 6], 4), ([7, 7, 7], 3), ([5, 8], 4), ([5], 2)]
+
+    def test_rolling_average_keeps_input_length(self):
+        with mock.patch.object(analytics, 'np', None): # Pure-Python branch
+            for values, window in self.ROLLING_CASES:
+                self.assertEqual(len(analytics.rolling_average(values, window)), len(values))
+            self.assertEqual(analytics.rolling_average([5, 8], 4), [None, None])
+
+    @skipUnless(analytics.np is not None, "NumPy not installed")
+    def test_numpy_branch_matches_pure_python(self):
+        for values, window in self.ROLLING_CASES:
+            with mock.patch.object(analytics, 'np', None):
+                expected = analytics.rolling_average(values, window)
+            self.assertEqual(analytics.rolling_average(values, window), expected)
+
+
+# Per-user fragments are served from cache until the user's data generation moves on
+class FragmentCacheTests(TestCase):
+    def test_cache_hit_and_invalidation(self):
+        cache.clear()
+        user = User.objects.create_user('howler')
+        builds = []
+        def build():
+            builds.append(1)
+            return f"fragment {len(builds)}"
+
+        self.assertEqual(caching.cached_for_user(user.id, 'feed', build), "fragment 1")
+        self.assertEqual(caching.cached_for_user(user.id, 'feed', build), "fragment 1")
+        self.assertEqual(caching.cached_for_user(user.id + 1, 'feed', build), "fragment 2") # Keys are per user
+
+        Workout.objects.create(user=user, workout_type="Running", duration=30, calories_burned=200) # Signal bumps the generation
+        self.assertEqual(caching.cached_for_user(user.id, 'feed', build), "fragment 3")
+        caching.bump_generation(user.id)
+        self.assertEqual(caching.cached_for_user(user.id, 'feed', build), "fragment 4")
+
+
+# Guards every route in my_app.urls against query explosions as a user's history grows
+class QueryCountBenchmarkTests(TestCase):
+    def test_query_counts_are_flat_and_within_baseline(self):
+        results = run_benchmarks(sizes=(5, 60))
+        failures = check_results(results, load_baseline())
+        self.assertFalse(failures, "\n".join(failures) + "\n\n" + format_results(results))
+
+
+# /metrics/ is for staff and token-holding scrapers only, whatever address the request appears to come from
+class MetricsAccessTests(TestCase):
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_staff_or_bearer_token_required(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='127.0.0.1').status_code, 403) # e.g. behind a local proxy
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer s3cret").status_code, 200)
+
+        self.client.force_login(User.objects.create_user('alpha', is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+# Sampled requests feed the latency histogram, per-alias SQL counters and the N+1 counter, in sync and async stacks
+@override_settings(METRICS_SAMPLE_RATE=1, N_PLUS_ONE_THRESHOLD=3)
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+        clock = iter([0.0, 0.03]) # Request start and end: lands in the 0.05 s bucket
+        patcher = mock.patch('my_app.middleware.time', mock.Mock(perf_counter=lambda: next(clock)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self):
+        request = RequestFactory().get('/')
+        request.resolver_match = mock.Mock(view_name='probe')
+        return request
+
+    def lookups(self, count):
+        for pk in range(count):
+            User.objects.filter(pk=pk).exists()
+        return HttpResponse("ok")
+
+    def assert_recorded(self, queries, n_plus_one):
+        bucket = LATENCY_BUCKETS.index(0.05)
+        self.assertEqual(registry.requests['probe'][bucket], 1)
+        self.assertEqual(sum(registry.requests['probe']), 1)
+        self.assertEqual(registry.queries['probe', 'default'], queries)
+        self.assertGreater(registry.sql_seconds['probe', 'default'], 0)
+        self.assertEqual(registry.n_plus_one['probe'], n_plus_one)
+        self.assertIn(f'wolf_db_queries_total{{view="probe",alias="default"}} {queries}', registry.render())
+
+    def test_sync_request(self):
+        middleware = InstrumentationMiddleware(lambda request: self.lookups(2))
+        self.assertEqual(middleware(self.request()).content, b"ok")
+        self.assert_recorded(queries=2, n_plus_one=0)
+
+    def test_sync_repeated_shape_is_flagged(self):
+        middleware = InstrumentationMiddleware(lambda request: self.lookups(3))
+        with self.assertLogs('my_app.middleware', 'WARNING'):
+            middleware(self.request())
+        self.assert_recorded(queries=3, n_plus_one=1)
+
+    async def test_async_repeated_shape_is_flagged(self):
+        async def view(request):
+            return await sync_to_async(self.lookups)(3)
+        middleware = InstrumentationMiddleware(view)
+        with self.assertLogs('my_app.middleware', 'WARNING'):
+            self.assertEqual((await middleware(self.request())).content, b"ok")
+        self.assert_recorded(queries=3, n_plus_one=1)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    async def test_unsampled_requests_record_nothing(self):
+        async def view(request):
+            return await sync_to_async(self.lookups)(3)
+        await InstrumentationMiddleware(view)(self.request())
+        await sync_to_async(InstrumentationMiddleware(lambda request: self.lookups(3)))(self.request())
+        self.assertEqual((dict(registry.requests), dict(registry.queries), dict(registry.n_plus_one)), ({}, {}, {}))
+
+
+# The SQLite profile opens every connection in WAL mode with relaxed fsyncs and immediate write locks
+@skipUnless(connection.vendor == 'sqlite', "SQLite profile only")
+class SQLiteProfileTests(SimpleTestCase):
+    def test_connections_use_wal_tuning(self):
+        with tempfile.TemporaryDirectory() as directory: # The test database is in memory, which has no WAL
+            primary = connections['default']
+            wrapper = primary.__class__({**primary.settings_dict, 'NAME': os.path.join(directory, 'wal.sqlite3')}, alias='wal_check')
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute("PRAGMA journal_mode")
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+                    cursor.execute("PRAGMA synchronous")
+                    self.assertEqual(cursor.fetchone()[0], 1) # NORMAL
+                self.assertEqual(wrapper.transaction_mode, 'IMMEDIATE')
+            finally:
+                wrapper.close()
+
+
+# Streak questions are answered from the bit string, for histories of any length
+class ActivityBitmapTests(SimpleTestCase):
+    def test_streaks_windows_and_round_trip(self):
+        start = date(2024, 1, 1)
+        days = [start + timedelta(days=offset) for offset in (*range(0, 40), *range(100, 103), 400)] # 40-day run, 3-day run, a lone day
+        bitmap = ActivityBitmap.from_days(reversed(days)) # Earlier days move the origin back
+        self.assertEqual(bitmap.longest_streak(), 40)
+        self.assertEqual(bitmap.longest_streak(start + timedelta(days=30), start + timedelta(days=102)), 10)
+        self.assertEqual(bitmap.streak_ending(start + timedelta(days=102)), 3)
+        self.assertEqual(bitmap.current_streak(start + timedelta(days=401)), 1) # Yesterday still counts
+        self.assertEqual(bitmap.current_streak(start + timedelta(days=402)), 0)
+        self.assertEqual(bitmap.days_active(start + timedelta(days=35), start + timedelta(days=101)), 7)
+
+        copy = ActivityBitmap.from_bytes(memoryview(bitmap.to_bytes()), bitmap.origin)
+        copy.discard(start + timedelta(days=20))
+        self.assertEqual((copy.longest_streak(), bitmap.longest_streak()), (20, 40))
+        self.assertNotIn(start + timedelta(days=20), copy)
+
+
+# Boards rank by the chosen metric, ties share a rank, and packs filter the field
+class LeaderboardTests(TestCase):
+    def test_rank_ordering_ties_and_pack_filter(self):
+        day = date(2024, 3, 13) # A Wednesday
+        scores = {'ana': (300, 2), 'ben': (500, 1), 'cal': (300, 3), 'dee': (100, 1)} # calories, workouts (on consecutive days)
+        users = {}
+        for username, (calories, count) in scores.items():
+            users[username] = User.objects.create_user(username=username, password="pw")
+            for offset in range(count):
+                Workout.objects.create(user=users[username], date=day - timedelta(days=offset), workout_type="Running", duration=30, calories_burned=calories // count)
+        pack = Group.objects.create(name="Night Pack")
+        pack.members.add(users['ana'], users['dee'])
+        User.objects.create_user(username="idle", password="pw") # No workouts, so not on the board
+        leaderboards.rebuild_leaderboards()
+
+        board = leaderboards.top_entries('week', 'calories', day=day)
+        self.assertEqual([(row['rank'], row['username'], row['score']) for row in board], [(1, 'ben', 500), (2, 'ana', 300), (2, 'cal', 300), (4, 'dee', 100)])
+        self.assertEqual([row['username'] for row in leaderboards.top_entries('week', 'streak', limit=2, day=day)], ['cal', 'ana'])
+        self.assertEqual(leaderboards.rank_of(users['cal'], 'week', 'calories', day=day), (2, 300))
+        self.assertEqual(leaderboards.rank_of(users['dee'], 'week', 'calories', group=pack, day=day), (2, 100))
+        self.assertEqual(leaderboards.rank_of(User.objects.get(username="idle"), 'all', 'workouts', day=day), (None, 0))
+
+
+# Directory search matches name prefixes and words anywhere in the name or description
+class GroupDirectoryTests(TestCase):
+    def test_search_and_pages(self):
+        for name, description in [("Wolf Pack", ""), ("Pack Runners", ""), ("Lone Wolves", "a small pack"), ("Night Owls", "")]:
+            Group.objects.create(name=name, description=description)
+        names = lambda query: sorted(group.name for group in directory.search_groups(query))
+        self.assertEqual(names("pack"), ["Lone Wolves", "Pack Runners", "Wolf Pack"]) # Prefix, later word, description
+        self.assertEqual(names("WOL"), ["Lone Wolves", "Wolf Pack"])
+        self.assertEqual(len(names("  ")), 4)
+
+        first, cursor = directory.group_page(page_size=3)
+        rest, end = directory.group_page(cursor=cursor, page_size=3)
+        self.assertEqual([group.name for group in first + rest], ["Lone Wolves", "Night Owls", "Pack Runners", "Wolf Pack"])
+        self.assertIsNone(end)
+
+    def test_member_count_follows_membership(self):
+        alpha, beta, gamma = [User.objects.create_user(name) for name in ('alpha', 'beta', 'gamma')]
+        moon, night = Group.objects.create(name="Moon Pack"), Group.objects.create(name="Night Pack")
+        counts = lambda: [Group.objects.get(pk=group.pk).member_count for group in (moon, night)]
+
+        moon.members.add(alpha, beta)
+        moon.members.add(alpha) # Already a member
+        self.assertEqual(counts(), [2, 0])
+        gamma.custom_groups.add(moon, night) # Reverse side
+        self.assertEqual(counts(), [3, 1])
+        night.members.remove(alpha) # Not a member
+        moon.members.remove(beta)
+        self.assertEqual(counts(), [2, 1])
+        gamma.custom_groups.clear()
+        self.assertEqual(counts(), [1, 0])
+        moon.members.add(beta, gamma)
+        moon.members.clear()
+        self.assertEqual(counts(), [0, 0])
+        moon.members.add(alpha, beta)
+        night.members.add(alpha)
+        alpha.delete()
+        self.assertEqual(counts(), [1, 0])
+
+
+# The worker's generation bump reaches the pages the web process cached while the task was queued
+class TaskCacheTests(TestCase):
+    @override_settings(TASKS_EAGER=False)
+    def test_worker_refresh_reaches_cached_routine(self):
+        cache.clear()
+        user = User.objects.create_user('howler')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('routine')).context['total_calories_burned'], 0)
+        Workout.objects.create(user=user, workout_type="Running", duration=30, calories_burned=200) # Queued, not run
+        self.assertEqual(self.client.get(reverse('routine')).context['total_calories_burned'], 0) # Rollup not refreshed yet
+
+        for claimed in tasks.claim_tasks(10): # Out of band, as run_task_worker would
+            self.assertTrue(tasks.run_task(claimed))
+        self.assertEqual(self.client.get(reverse('routine')).context['total_calories_burned'], 200)
+
+    def test_queued_tasks_need_a_shared_cache(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tempfile.gettempdir()}}
+        with override_settings(TASKS_EAGER=False, CACHES=locmem):
+            self.assertEqual([error.id for error in checks.check_task_cache(None)], ['my_app.E001'])
+        with override_settings(TASKS_EAGER=True, CACHES=locmem):
+            self.assertEqual(checks.check_task_cache(None), [])
+        with override_settings(TASKS_EAGER=False, CACHES=shared):
+            self.assertEqual(checks.check_task_cache(None), [])
+
+
+# The queue dedupes keyed tasks, backs off failed ones, and reclaims tasks whose worker died
+@override_settings(TASKS_EAGER=False, TASK_RETRY_SECONDS=5, TASK_LEASE_SECONDS=60)
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        def flaky(n):
+            self.calls.append(n)
+            if len(self.calls) < 3:
+                raise RuntimeError("flaked")
+        patcher = mock.patch.dict(tasks.TASKS, {'flaky': tasks.TaskSpec('flaky', flaky, max_attempts=2)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_due(self):
+        Task.objects.update(run_after=timezone.now())
+
+    def test_idempotency_key_dedupes(self):
+        first = tasks.enqueue('flaky', key="flaky:1", n=1)
+        self.assertEqual(tasks.enqueue('flaky', key="flaky:1", n=2).pk, first.pk)
+        tasks.enqueue('flaky', n=3)
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_retry_backoff_then_failure(self):
+        queued = tasks.enqueue('flaky', n=1)
+        [claimed] = tasks.claim_tasks(10)
+        with self.assertLogs('my_app.tasks', 'WARNING'):
+            self.assertFalse(tasks.run_task(claimed))
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts, queued.last_error), (Task.QUEUED, 1, "RuntimeError: flaked"))
+        self.assertAlmostEqual((queued.run_after - timezone.now()).total_seconds(), 5, delta=1)
+        self.assertEqual(tasks.claim_tasks(10), []) # Not due yet
+
+        self.make_due()
+        [claimed] = tasks.claim_tasks(10)
+        with self.assertLogs('my_app.tasks', 'WARNING'):
+            self.assertFalse(tasks.run_task(claimed)) # Second of max_attempts=2
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (Task.FAILED, 2))
+        self.make_due()
+        self.assertEqual(tasks.claim_tasks(10), []) # Failed tasks stay failed
+
+    def test_expired_lease_is_reclaimed(self):
+        self.calls += [0, 0] # The next run succeeds
+        queued = tasks.enqueue('flaky', n=1)
+        tasks.claim_tasks(10) # This worker dies without finishing
+        self.assertEqual(tasks.claim_tasks(10), []) # Lease still held
+        Task.objects.update(started_at=timezone.now() - timedelta(seconds=61))
+        [claimed] = tasks.claim_tasks(10)
+        self.assertEqual(claimed.attempts, 2)
+        self.assertTrue(tasks.run_task(claimed))
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.DONE)
+
+    def test_eager_runs_inline_after_commit(self):
+        self.calls += [0, 0]
+        with override_settings(TASKS_EAGER=True), self.captureOnCommitCallbacks(execute=True):
+            self.assertIsNone(tasks.enqueue('flaky', key="flaky:1", n=7))
+            self.assertEqual(len(self.calls), 2) # Not while the transaction is open
+        self.assertEqual(self.calls[-1], 7)
+        self.assertFalse(Task.objects.exists())
+
+
+# Deleting an account with logs must not re-create its rollups from inline tasks mid-cascade
+class AccountDeletionTests(TransactionTestCase):
+    def test_delete_user_with_logs_under_default_settings(self):
+        user = User.objects.create_user('howler', password="pw")
+        Workout.objects.create(user=user, workout_type="Running", duration=30, calories_burned=200)
+        MealLog.objects.create(user=user, meal_name="Apple", meal_type="Snack", calories=95)
+        self.assertTrue(DailySummary.objects.filter(user=user).exists()) # Eager tasks ran after each commit
+
+        self.client.force_login(user)
+        response = self.client.post(reverse('delete_account'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(User.objects.filter(pk=user.pk).exists())
+        self.assertFalse(DailySummary.objects.exists())
+        self.assertFalse(BadgeProgress.objects.exists())
+        self.assertFalse(LeaderboardEntry.objects.exists())
+
+
+# The async pack page applies the same membership rule to posts as the sync one
+class AsyncChatPostingTests(TestCase):
+    async def test_non_members_cannot_post(self):
+        member, outsider = await User.objects.acreate_user('howler'), await User.objects.acreate_user('stray')
+        group = await Group.objects.acreate(name="Moon Pack")
+        await group.members.aadd(member)
+
+        for user, status in ((outsider, 403), (member, 302)):
+            request = AsyncRequestFactory().post('/', {'message': f"hello from {user.username}"})
+            request.user = user
+            request.auser = sync_to_async(lambda user=user: user)
+            response = await async_views.group_detail(request, group.id) # The view asgi.py routes to
+            self.assertEqual(response.status_code, status)
+        self.assertEqual([content async for content in Message.objects.values_list('content', flat=True)], ["hello from howler"])
+
+
+# Catalog lookups rank name prefixes before later words, and estimates follow the parsed portion
+class CatalogTests(SimpleTestCase):
+    def test_prefix_search_and_estimates(self):
+        index = catalog.PrefixIndex(catalog.Food(name, 100, 100) for name in ["Bread", "Brown rice", "Chicken breast", "Whole-wheat bread"])
+        self.assertEqual([food.name for food in index.search("  BR ")], ["Bread", "Brown rice", "Whole-wheat bread", "Chicken breast"]) # Word matches in key order
+        self.assertEqual([food.name for food in index.search("bread")], ["Bread", "Whole-wheat bread"])
+        self.assertEqual([food.name for food in index.search("bre", limit=1)], ["Bread"])
+        self.assertEqual(index.search(""), [])
+
+        self.assertEqual(catalog.parse_quantity("1 1/2 cups"), (1.5, 'cup'))
+        self.assertEqual(catalog.parse_quantity("a bowl of soup"), (1, 'bowl'))
+        self.assertIsNone(catalog.parse_quantity("1/0 g"))
+        self.assertIsNone(catalog.parse_quantity("two spoons"))
+        self.assertEqual(catalog.parse_quantity("1,000g"), (1000, 'g')) # Thousands separator
+        self.assertEqual(catalog.parse_quantity("12,500.5 ml"), (12500.5, 'ml'))
+        self.assertEqual(catalog.parse_quantity("1,5 kg"), (1.5, 'kg')) # Decimal comma
+        self.assertEqual(catalog.estimate_meal_calories("Chicken breast", "1,000g"), 1650)
+        self.assertEqual(catalog.estimate_meal_calories("chicken  breast", "200g"), 330)
+        self.assertEqual(catalog.estimate_meal_calories("Apple", "2 pieces"), 189) # 2 x 182 g servings at 52 kcal/100g
+        self.assertIsNone(catalog.estimate_meal_calories("Moon cheese", "200g"))
+        self.assertEqual(catalog.estimate_workout_calories("running", 30, 80), 392) # MET 9.8 x 80 kg x 0.5 h
+        self.assertEqual(catalog.estimate_workout_calories("Running", 60), 686) # Default 70 kg
+
+
+# Profiles are created once at sign-up and only written when their fields change
+class ProfileWriteTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('howler', password='moonlight-42')
+
+    def profile_queries(self, queries):
+        return [query['sql'] for query in queries if Profile._meta.db_table in query['sql']]
+
+    def test_login_runs_no_profile_queries(self):
+        with CaptureQueriesContext(connection) as queries: # Login saves last_login on the user
+            response = self.client.post(reverse('login'), {'username': 'howler', 'password': 'moonlight-42'})
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        self.assertEqual(self.profile_queries(queries), [])
+
+    def test_unchanged_profile_form_is_not_saved(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('profile'), {'weight': '', 'height_feet': '', 'height_inches': '', 'age': '', 'desired_weight': ''})
+        self.assertFalse([sql for sql in self.profile_queries(queries) if sql.startswith('UPDATE')])
+
+        self.client.post(reverse('profile'), {'weight': '72.5', 'height_feet': '', 'height_inches': '', 'age': '', 'desired_weight': ''})
+        self.assertEqual(Profile.objects.get(user=self.user).weight, 72.5)
+
+    def test_profile_for_creates_a_missing_profile_and_caches_it(self):
+        Profile.objects.filter(user=self.user).delete() # An account from before profiles existed
+        user = User.objects.get(pk=self.user.pk)
+        profile = profile_for(user)
+        with self.assertNumQueries(0):
+            self.assertEqual(profile_for(user), profile)
+        self.assertEqual(Profile.objects.filter(user=user).count(), 1)
+
+
+
+# Only avatar thumbnails are served from media, with byte ranges, revalidation and immutable caching
+class MediaServingTests(SimpleTestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = root.name
+        for name in ("avatars/ab/abc-64.webp", "incoming/raw.png", "profile_pics/original.jpg", "notes.txt"):
+            os.makedirs(os.path.join(root.name, os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(root.name, name), 'wb') as handle:
+                handle.write(b"0123456789")
+        self.settings_override = override_settings(MEDIA_ROOT=root.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def get(self, path="avatars/ab/abc-64.webp", **headers):
+        return assets.serve_media(RequestFactory().get('/', headers=headers), path)
+
+    def test_ranges_and_conditional_requests(self):
+        full = self.get()
+        self.assertEqual((full.status_code, b"".join(full.streaming_content)), (200, b"0123456789"))
+        etag = full['ETag']
+
+        partial = self.get(range="bytes=2-4")
+        self.assertEqual((partial.status_code, partial['Content-Range'], b"".join(partial.streaming_content)), (206, "bytes 2-4/10", b"234"))
+        self.assertEqual(b"".join(self.get(range="bytes=-3").streaming_content), b"789")
+        self.assertEqual(b"".join(self.get(range="bytes=8-99", if_range=etag).streaming_content), b"89")
+        self.assertEqual(self.get(range="bytes=2-4", if_range='"stale"').status_code, 200) # Changed since: whole file
+        for invalid in ("bytes=5-2", "bytes=12-5"): # Ignored, not unsatisfiable
+            self.assertEqual(self.get(range=invalid).status_code, 200)
+
+        unsatisfiable = self.get(range="bytes=10-")
+        self.assertEqual((unsatisfiable.status_code, unsatisfiable['Content-Range']), (416, "bytes */10"))
+        self.assertEqual(self.get(if_none_match=etag).status_code, 304)
+
+    def test_cache_control_and_hidden_files(self):
+        self.assertEqual(self.get()['Cache-Control'], assets.IMMUTABLE)
+        revalidated = assets.serve_file(RequestFactory().get('/'), os.path.join(self.root, "notes.txt"), assets.REVALIDATE)
+        self.assertEqual(revalidated['Cache-Control'], assets.REVALIDATE)
+        for path in ("incoming/raw.png", "profile_pics/original.jpg", "avatars/../profile_pics/original.jpg", "notes.txt", "avatars/", "avatars/missing.webp"):
+            with self.assertRaises(Http404):
+                self.get(path)
+
+
+# Uploads are size-checked while streaming and pixel-checked from the header, leaving nothing behind when rejected
+class AvatarUploadTests(TransactionTestCase): # Committed, so eager tasks run as they would in a request
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.incoming = os.path.join(root.name, 'incoming')
+        self.settings_override = override_settings(MEDIA_ROOT=root.name, AVATAR_MAX_BYTES=1024, AVATAR_MAX_PIXELS=10_000)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def png(self, width, height):
+        buffer = io.BytesIO()
+        Image.new('RGB', (width, height), (200, 80, 40)).save(buffer, 'PNG')
+        return SimpleUploadedFile("wolf.png", buffer.getvalue(), content_type='image/png')
+
+    def test_accepts_a_small_picture(self):
+        upload = self.png(64, 64)
+        sha256 = avatars.save_upload(upload)
+        self.assertEqual(sha256, hashlib.sha256(upload.file.getvalue()).hexdigest())
+        self.assertEqual(os.listdir(self.incoming), [f"{sha256}.upload"])
+
+    def test_rejects_oversized_and_huge_pictures(self):
+        with self.assertRaisesMessage(ValueError, "at most"):
+            avatars.save_upload(SimpleUploadedFile("big.png", os.urandom(4096)))
+        with self.assertRaisesMessage(ValueError, "too many pixels"): # 200 x 200 compresses well under 1 KB
+            avatars.save_upload(self.png(200, 200))
+        with self.assertRaisesMessage(ValueError, "can read"):
+            avatars.save_upload(SimpleUploadedFile("notes.png", b"not a picture"))
+        self.assertEqual(os.listdir(self.incoming), []) # Partial files are removed
+
+    def test_set_avatar_reports_whether_the_picture_is_live(self):
+        self.addCleanup(avatars.reset_pool)
+        howler, runner = User.objects.create_user('howler'), User.objects.create_user('runner')
+        with override_settings(TASKS_EAGER=False):
+            self.assertFalse(avatars.set_avatar(howler, self.png(64, 64))) # Waiting for the worker
+        with override_settings(TASKS_EAGER=True):
+            self.assertTrue(avatars.set_avatar(runner, self.png(64, 64))) # Processed inline
+            self.assertTrue(avatars.set_avatar(howler, self.png(64, 64))) # Same content: thumbnails reused
+        self.assertEqual(Profile.objects.filter(avatar__isnull=False).count(), 2)
+
+
+# Template profiling splits each render into inclusive and self time, and only costs anything while a profile is active
+class RenderProfilerTests(SimpleTestCase):
+    def setUp(self):
+        originals = (Template._render, BlockNode.render, IncludeNode.render, render_profiler._installed)
+        def restore():
+            Template._render, BlockNode.render, IncludeNode.render, render_profiler._installed = originals
+        self.addCleanup(restore)
+        render_profiler._installed = False
+        render_profiler.install()
+        self.engine = Engine(loaders=[('django.template.loaders.locmem.Loader', {
+            'base.html': "<main>{% block content %}{% endblock %}</main>",
+            'child.html': "{% extends 'base.html' %}{% block content %}{% include 'row.html' %}{% endblock %}",
+            'row.html': "<p>{{ name }}</p>",
+        })])
+
+    def test_inclusive_and_self_time_of_nested_renders(self):
+        clock = itertools.count() # Every perf_counter() call moves time on by one second
+        with mock.patch.object(render_profiler, 'time', mock.Mock(perf_counter=lambda: next(clock))):
+            with render_profiler.profile_renders() as profile:
+                html = self.engine.get_template('child.html').render(Context({'name': "wolf"}))
+        self.assertEqual(html, "<main><p>wolf</p></main>")
+        self.assertEqual(dict(profile.entries), { # [renders, inclusive, self], outermost first
+            ('template', 'child.html'): [1, 9, 2],
+            ('template', 'base.html'): [1, 7, 2],
+            ('block', 'content (child.html)'): [1, 5, 2],
+            ('include', 'row.html'): [1, 3, 2],
+            ('template', 'row.html'): [1, 1, 1],
+        })
+        self.assertEqual(profile.total, 9)
+        self.assertEqual(profile.slowest()[-1], ('template', 'row.html', 1, 1, 1)) # Least self time last
+
+    def test_install_is_idempotent_and_idle_without_a_profile(self):
+        wrapped = Template._render
+        render_profiler.install()
+        self.assertIs(Template._render, wrapped)
+        self.assertFalse(hasattr(wrapped.__wrapped__, '__wrapped__')) # Wrapped exactly once
+
+        clock = mock.Mock()
+        with mock.patch.object(render_profiler, 'time', clock):
+            self.assertEqual(self.engine.get_template('child.html').render(Context({'name': "wolf"})), "<main><p>wolf</p></main>")
+        clock.perf_counter.assert_not_called()
+
+    def test_template_bench_reports_each_page(self):
+        out = io.StringIO()
+        call_command('template_bench', rows=[3], repeat=2, top=2, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[:2] for line in lines[1:3]], [['dashboard', '3'], ['group_detail', '3']])
+        self.assertIn("dashboard at 3 rows, slowest by self time:", lines)
+        self.assertIn("group_detail at 3 rows, slowest by self time:", lines)
+
+    @override_settings(METRICS_SAMPLE_RATE=1, DEBUG=True, TEMPLATE_SLOW_SECONDS=0)
+    def test_middleware_reports_slow_renders(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+        with self.assertLogs('my_app.middleware', 'WARNING') as logs:
+            response = self.client.get(reverse('login'))
+        self.assertTrue(response['Server-Timing'].startswith("render;dur="))
+        self.assertIn('desc="template account/login.html"', response['Server-Timing'])
+        self.assertTrue(any(line.startswith("WARNING:my_app.middleware:Slow render in login") for line in logs.output))
+        self.assertIn('wolf_renders_total{view="login",kind="template",name="account/login.html"} 1', registry.render())
+
+
+# Reads move to the replica only in marked views, and never right after the same client wrote
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        router = self.router = PrimaryReplicaRouter()
+        routed = self.routed = []
+
+        def read_view(request):
+            routed.extend([router.db_for_read(Workout), router.db_for_read(User)])
+            return HttpResponse()
+
+        def write_view(request):
+            router.db_for_write(Workout)
+            return read_view(request)
+
+        self.read_view, self.write_view = read_view, write_view
+
+    def serve(self, view, cookies=None):
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies or {})
+        middleware = ReplicaStickinessMiddleware(lambda request: middleware.process_view(request, view, (), {}) or view(request))
+        return middleware(request)
+
+    def test_marked_views_read_app_models_from_the_replica(self):
+        self.serve(self.read_view)
+        self.serve(replica_reads(self.read_view))
+        self.assertEqual(self.routed, [None, None, REPLICA, None]) # Users (and sessions) always come from the primary
+        self.assertIsNone(self.router.db_for_read(Workout)) # Outside a request, e.g. the task worker
+        self.assertIsNone(current_state())
+
+    def test_a_write_pins_the_request_and_the_client(self):
+        response = self.serve(replica_reads(self.write_view))
+        self.assertEqual(self.routed[0], None)
+        self.assertIn(ReplicaStickinessMiddleware.cookie_name, response.cookies)
+
+        response = self.serve(replica_reads(self.read_view), {ReplicaStickinessMiddleware.cookie_name: '1'})
+        self.assertEqual(self.routed[2], None)
+        self.assertNotIn(ReplicaStickinessMiddleware.cookie_name, response.cookies) # Reads don't extend the window
+
+
+# Old chat moves into monthly archives but still reads back, in order, through "load older"
+class MessageArchiveTests(TestCase):
+    def test_archived_messages_page_back_in_order(self):
+        user = User.objects.create_user('howler')
+        group = Group.objects.create(name="Moon Pack")
+        group.members.add(user)
+        now = timezone.now()
+        ids = []
+        for day in range(120, 0, -1): # One message a day, oldest first
+            message = Message.objects.create(group=group, user=user, content=f"{day} days ago")
+            Message.objects.filter(pk=message.pk).update(timestamp=now - timedelta(days=day))
+            ids.append(message.pk)
+
+        moved, _ = archive_messages(now - timedelta(days=30))
+        self.assertEqual(Message.objects.count(), 120 - moved)
+        self.assertEqual(sum(MessageArchive.objects.values_list('message_count', flat=True)), moved)
+
+        self.client.force_login(user)
+        seen, before = [], ids[-1] + 1
+        while before is not None:
+            data = self.client.get(reverse('group_messages', args=[group.id]), {'before': before}).json()
+            seen = [message['id'] for message in data['messages']] + seen
+            before = data['messages'][0]['id'] if data['has_more'] else None
+        self.assertEqual(seen, ids)
@@ -1,9 +1,12 @@
+from django.conf import settings
 from django.urls import path
-from . import views
-from .views import group_list, group_create, group_detail, join_group, leave_group, profile_view
+from . import async_views, views
+from .views import group_list, group_create, leave_group, profile_view
 from django.contrib.auth.views import LogoutView
 from django.views.generic import TemplateView
 
+live = async_views if settings.ASYNC_VIEWS else views # Chat and logging views, async when served by asgi.py
+
 urlpatterns = [
     path('', views.index, name='index'),            ############# Frontend Paths ###############
     path('dashboard/', views.dashboard, name='dashboard'),
@@ -13,18 +16,26 @@ urlpatterns = [
     path('register/', views.register, name='register'),
     path('profile/', profile_view, name='profile'),
     path('delete-account/', views.delete_account, name='delete_account'),
-    path('log-workout/', views.log_workout, name='log_workout'), ############# Workout Paths ###############
-    path('log-meal/', views.log_meal, name='log_meal'),
+    path('log-workout/', live.log_workout, name='log_workout'), ############# Workout Paths ###############
+    path('log-meal/', live.log_meal, name='log_meal'),
+    path('catalog/search/', views.catalog_search, name='catalog_search'),
     path('delete-workout/<int:workout_id>/', views.delete_workout, name='delete_workout'),
     path('delete-meal/<int:meal_id>/', views.delete_meal, name='delete_meal'),
+    path('import/', views.import_history, name='import_history'),
+    path('export/', views.export_history, name='export_history'),
     path('routine/', views.routine_view, name='routine'),
+    path('analytics/', views.analytics_view, name='analytics'),
     path('groups/', group_list, name='group_list'), #################### Group views ###############
     path('groups/main/', views.group_main, name='group_main'),
+    path('groups/leaderboard/', views.leaderboard, name='leaderboard'),
     path('groups/create/', group_create, name='group_create'),
-    path('groups/<int:group_id>/', group_detail, name='group_detail'),
-    path('groups/<int:group_id>/join/', join_group, name='join_group'),
+    path('groups/<int:group_id>/', live.group_detail, name='group_detail'),
+    path('groups/<int:group_id>/messages/', views.group_messages, name='group_messages'),
+    path('groups/<int:group_id>/leaderboard/', views.leaderboard, name='group_leaderboard'),
+    path('groups/<int:group_id>/join/', live.join_group, name='join_group'),
     path('groups/<int:group_id>/leave/', leave_group, name='leave_group'),
     path('pricing/', views.pricing_view, name='pricing'), ############# Other Paths ###############
     path('conservation/', views.conservation_view, name='conservation'),
     path('challenges/', views.challenges_and_badges, name='challenges_and_badges'),
+    path('metrics/', views.metrics_view, name='metrics'),
 ]
\ No newline at end of file
@@ -1,44 +1,34 @@
-from datetime import timedelta, date
-from .models import Badge, UserBadge, Workout  
+from datetime import date
+from django.db import transaction
+from django.db.models import Q
+from . import badges
 
-# Checks if badges should be awarded to a user based on their activity.
-def check_and_award_badges(user):
-    today = date.today()
-
-    awarded_ids = set(UserBadge.objects.filter(user=user).values_list('badge_id', flat=True))
+# Keyset ("cursor") pagination over (date, id) for the dashboard feeds.
+# Cursors look like "2025-04-25.42" and point at the last row of the previous page.
+def encode_cursor(obj):
+    return f"{obj.date.isoformat()}.{obj.id}"
 
-    # 5-Day Streak Badge
-    streak_days = [today - timedelta(days=i) for i in range(5)]
-    streak_workouts = Workout.objects.filter(user=user, date__in=streak_days).values_list('date', flat=True)
-    if len(set(streak_workouts)) == 5: # Check if there are workouts for all 5 days
-        badge = Badge.objects.get(name="🔥 5-Day Streak")
-        if badge.id not in awarded_ids:
-            UserBadge.objects.create(user=user, badge=badge)
+def decode_cursor(cursor): # Raises ValueError for malformed cursors
+    day, _, pk = cursor.partition('.')
+    return date.fromisoformat(day), int(pk)
 
-    # 10 Total Workouts Badge
-    if Workout.objects.filter(user=user).count() >= 10: # Check if the user has completed 10 workouts
-        badge = Badge.objects.get(name="🌲 Trail Hunter")
-        if badge.id not in awarded_ids:
-            UserBadge.objects.create(user=user, badge=badge)
+def keyset_page(queryset, cursor=None, page_size=20):
+    queryset = queryset.order_by('-date', '-id') # Matches the (user, -date, -id) indexes
+    if cursor:
+        cursor_date, cursor_id = decode_cursor(cursor)
+        queryset = queryset.filter(Q(date__lt=cursor_date) | Q(date=cursor_date, id__lt=cursor_id))
 
-    # Pack Leader Badge - Joined a group
-    if user.custom_groups.exists():   # Check if the user is part of any group
-        badge = Badge.objects.get(name="🐾 Pack Leader")
-        if badge.id not in awarded_ids:
-            UserBadge.objects.create(user=user, badge=badge)
+    rows = list(queryset[:page_size + 1]) # Fetch one extra row to know if there is a next page
+    next_cursor = encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
 
-def ensure_badges_exist():
-    badges = [ # List of badges to ensure exist in the database
-        {"name": "🔥 5-Day Streak", "description": "Complete 5 days of workouts in a row.", "emoji": "🔥"},
-        {"name": "🌲 Trail Hunter", "description": "Complete 10 total workouts.", "emoji": "🌲"},
-        {"name": "🐾 Pack Leader", "description": "Joined a wolf pack group!", "emoji": "🐾"},
-    ]
+# Full-history fallback for the badge engine: rebuilds the user's progress and awards anything earned.
+# Logging views no longer call this; progress is kept current by the signals in signals.py.
+def check_and_award_badges(user):
+    with transaction.atomic():
+        progress = badges.rebuild_progress(user.id)
+        badges.award_badges(progress)
+        progress.save()
 
-    for badge_data in badges: # Create or get each badge
-        Badge.objects.get_or_create(
-            name=badge_data["name"],
-            defaults={
-                "description": badge_data["description"],
-                "emoji": badge_data["emoji"],
-            }
-        )
\ No newline at end of file
+def ensure_badges_exist(): # Kept for callers outside the request path; the catalog creates any missing badges
+    return badges.badge_catalog()
@@ -1,22 +1,74 @@
+import csv
+import io
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+from django.template.loader import render_to_string
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
-from .models import Group, Message, Profile, Workout, MealLog, Badge, UserBadge
-from .forms import UserProfileForm, WorkoutLogForm, MealLogForm, CustomUserCreationForm, CustomAuthenticationForm, UserProfileForm,  GroupForm, ProfileForm
-from .utils import check_and_award_badges, ensure_badges_exist
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_datetime
+from .models import Group, LeaderboardEntry, Message, MessageArchive, Profile, Workout, MealLog, Badge, UserBadge, profile_for
+from .forms import UserProfileForm, WorkoutLogForm, MealLogForm, CustomUserCreationForm, CustomAuthenticationForm, UserProfileForm,  GroupForm, ProfileForm, HistoryImportForm, AvatarForm
+from .utils import keyset_page
+from .caching import cached_for_user
+from .avatars import set_avatar, user_thumbnail
+from .badges import streak_summary
+from .catalog import INDEXES as CATALOG_INDEXES
+from .directory import group_page
+from .leaderboards import METRICS, PERIODS as LEADERBOARD_PERIODS, rank_of, top_entries
+from .metrics import registry
+from .routers import replica_reads
+from .tasks import publish_queue_metrics
+from .summaries import summary_for
+from .analytics import PERIODS, user_analytics
+from .archive import messages_before
+from .chat import message_payload, post_message
+from .importers import import_rows, iter_rows
+from .exporters import EXPORT_DATASETS, aiter_blocks, csv_lines, encode_blocks, gzip_blocks, ndjson_lines
 
 ################################## Front end applications #############################
 def index(request):
     return render(request, "pages/index.html") # Render the index.html template
 
+DASHBOARD_FEEDS = { # Feed name -> (model, fragment template)
+    'workouts': (Workout, 'partials/workout_feed.html'),
+    'meals': (MealLog, 'partials/meal_feed.html'),
+}
+
+def _feed_fragment(user, feed, cursor, page_size): # Rendered feed page, cached per user until their data changes
+    model, template = DASHBOARD_FEEDS[feed]
+
+    def build():
+        items, next_cursor = keyset_page(model.objects.filter(user=user), cursor, page_size)
+        return render_to_string(template, {'items': items, 'next_cursor': next_cursor, 'cursor': cursor})
+
+    return cached_for_user(user.id, f"dashboard:{feed}:{page_size}:{cursor or ''}", build)
+
 @login_required
+@replica_reads
 def dashboard(request):
-    # Fetch the logged meals and workouts for the current user
-    meals = MealLog.objects.filter(user=request.user)
-    workouts = Workout.objects.filter(user=request.user)
-    
-    return render(request, "dashboard.html", {'meals': meals, 'workouts': workouts})
+    page_size = settings.DASHBOARD_PAGE_SIZE
+
+    # "Load more" requests only render the next page of a single feed
+    feed = request.GET.get('feed')
+    if feed:
+        if feed not in DASHBOARD_FEEDS:
+            return HttpResponseBadRequest("Unknown feed.")
+        try:
+            return HttpResponse(_feed_fragment(request.user, feed, request.GET.get('cursor'), page_size))
+        except ValueError:
+            return HttpResponseBadRequest("Invalid cursor.")
+
+    # First page of logged workouts and meals for the current user
+    return render(request, "dashboard.html", {
+        'workouts_html': _feed_fragment(request.user, 'workouts', None, page_size),
+        'meals_html': _feed_fragment(request.user, 'meals', None, page_size),
+    })
 
 #################################### User Authentication #############################
 # User Registration View
@@ -53,7 +105,10 @@ def logout_view(request):
 @login_required
 def log_workout(request):
     if request.method == "POST":
-        form = WorkoutLogForm(request.POST)
+        weight = None
+        if not request.POST.get('calories_burned'): # Only the calorie estimate needs the profile weight
+            weight = Profile.objects.filter(user=request.user).values_list('weight', flat=True).first()
+        form = WorkoutLogForm(request.POST, weight_kg=weight)
         if form.is_valid():     # If the form is valid, save the workout
             workout = form.save(commit=False)
             workout.user = request.user
@@ -62,8 +117,6 @@ def log_workout(request):
     else:
         form = WorkoutLogForm()
 
-    check_and_award_badges(request.user) # Check and award badges after logging a workout
-
     return render(request, 'logs/log_workout.html', {'form': form})
 
 # Log Meals
@@ -79,11 +132,21 @@ def log_meal(request):
     else:
         form = MealLogForm()
 
-    ensure_badges_exist() # Ensure badges exist in the database
-    check_and_award_badges(request.user) # Check and award badges after joining a group
-
     return render(request, 'logs/log_meal.html', {'form': form})
 
+# Typeahead for the logging forms, served from the in-memory catalog without touching the database
+def catalog_search(request):
+    kind = request.GET.get('kind', 'food')
+    if kind not in CATALOG_INDEXES:
+        return JsonResponse({'error': f"'kind' must be one of: {', '.join(CATALOG_INDEXES)}."}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        return JsonResponse({'error': "'limit' must be a whole number."}, status=400)
+    index, detail = CATALOG_INDEXES[kind]
+    results = [{**vars(entry), 'detail': detail(entry)} for entry in index().search(request.GET.get('q', ''), limit)]
+    return JsonResponse({'results': results})
+
 # Delete user workouts
 @login_required
 def delete_workout(request, workout_id):
@@ -98,17 +161,64 @@ def delete_meal(request, meal_id):
     meal.delete()
     return redirect('dashboard')
 
+# Bulk import of workout or meal history
+@login_required
+def import_history(request):
+    result = None
+    if request.method == 'POST':
+        form = HistoryImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            fmt = 'csv' if upload.name.lower().endswith('.csv') else 'json'
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='') # Large uploads are already on disk
+            try:
+                result = import_rows(request.user, form.cleaned_data['kind'], iter_rows(stream, fmt))
+            except (ValueError, UnicodeDecodeError, csv.Error) as error:
+                # Batches before the error are already saved (and counted in the totals and badges)
+                form.add_error('file', f"Could not read the rest of this file: {error}. Rows before that point were imported.")
+    else:
+        form = HistoryImportForm()
+
+    return render(request, 'logs/import_history.html', {'form': form, 'result': result})
+
+# Streaming export of the user's full history (?format=csv|ndjson&dataset=...&gzip=1)
+@login_required
+def export_history(request):
+    fmt = request.GET.get('format', 'csv')
+    dataset = request.GET.get('dataset', 'workouts' if fmt == 'csv' else 'all')
+
+    if fmt == 'csv' and dataset in EXPORT_DATASETS:
+        lines = csv_lines(request.user, dataset)
+        content_type = 'text/csv'
+    elif fmt == 'ndjson' and (dataset == 'all' or dataset in EXPORT_DATASETS):
+        lines = ndjson_lines(request.user, list(EXPORT_DATASETS) if dataset == 'all' else [dataset])
+        content_type = 'application/x-ndjson'
+    else:
+        return HttpResponseBadRequest("CSV exports need one dataset; NDJSON accepts one dataset or 'all'.")
+
+    filename = f"wolvenfest-{dataset}-{timezone.now():%Y%m%d}.{fmt}"
+    blocks = encode_blocks(lines)
+    if request.GET.get('gzip') == '1':
+        blocks, content_type, filename = gzip_blocks(blocks), 'application/gzip', filename + '.gz'
+    if isinstance(request, ASGIRequest): # Stream block by block under ASGI too
+        blocks = aiter_blocks(blocks)
+
+    response = StreamingHttpResponse(blocks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 #################################### Routine Management #############################
 @login_required
 def routine_view(request): # Routine view for logged meals and workouts
-    profile = request.user.profile
+    profile = profile_for(request.user)
     meals = ['Breakfast', 'Lunch', 'Dinner']
 
     # Handle form submission for profile update
     if request.method == 'POST':
         form = ProfileForm(request.POST, instance=profile)
         if form.is_valid():
-            form.save()
+            if form.has_changed(): # Resubmitting the same values doesn't write the row again
+                form.save()
             return redirect('routine')
     else:
         form = ProfileForm(instance=profile)
@@ -116,47 +226,53 @@ def routine_view(request): # Routine view for logged meals and workouts
     # Get today's date
     today = timezone.now().date()
 
-    # Filter meals and workouts for today using year, month, and day
-    logged_meals = MealLog.objects.filter(user=request.user, 
-                                          date__year=today.year,
-                                          date__month=today.month,
-                                          date__day=today.day)
-    
-    logged_workouts = Workout.objects.filter(user=request.user,
-                                                date__year=today.year,
-                                                date__month=today.month,
-                                                date__day=today.day)
-
-    # Calculate total calories consumed
-    total_calories = sum(meal.calories for meal in logged_meals)
-
-    # Calculate total calories burned
-    total_calories_burned = sum(workout.calories_burned for workout in logged_workouts)
+    # Lazy querysets, only evaluated if the template lists the individual logs
+    logged_meals = MealLog.objects.filter(user=request.user, date=today)
+    logged_workouts = Workout.objects.filter(user=request.user, date=today)
 
     # Define user goals
     calorie_goal = profile.calorie_goal if hasattr(profile, 'calorie_goal') else 2000
     workout_goal = 3  # Example goal of 3 workouts per day
 
-    # Calculate progress percentages
-    calorie_percent = min((total_calories / calorie_goal) * 100, 100)
-    calories_burned_percent = min((total_calories_burned / calorie_goal) * 100, 100)  
-    workout_percent = min((len(logged_workouts) / workout_goal) * 100, 100)
+    def build_totals(): # Today's totals come from the precomputed rollup instead of summing every log
+        summary = summary_for(request.user, today)
+        return {
+            'total_calories': summary.calories_in,
+            'total_calories_burned': summary.calories_burned,
+            'calorie_percent': min((summary.calories_in / calorie_goal) * 100, 100),
+            'calories_burned_percent': min((summary.calories_burned / calorie_goal) * 100, 100),
+            'workout_percent': min((summary.workout_count / workout_goal) * 100, 100),
+            'workout_count': summary.workout_count,
+        }
+
+    totals = cached_for_user(request.user.id, f"routine:{today}:{calorie_goal}", build_totals)
 
     context = { # Pass the context, including the form and logged meals/workouts
         'profile_form': form,
         'meals': meals,
-        'total_calories': total_calories,
-        'total_calories_burned': total_calories_burned,
         'calorie_goal': calorie_goal,
-        'calorie_percent': calorie_percent,
-        'calories_burned_percent': calories_burned_percent,  # Add this to context
-        'workout_percent': workout_percent,
         'logged_meals': logged_meals,
-        'logged_workouts': logged_workouts
+        'logged_workouts': logged_workouts,
+        **totals,
     }
 
     return render(request, 'logs/routine.html', context)
 
+# Calorie and workout trends for charts (?period=week|month&window=4&days=365)
+@login_required
+@replica_reads
+def analytics_view(request):
+    period = request.GET.get('period', 'week')
+    try:
+        window = int(request.GET.get('window', 4))
+        days = int(request.GET.get('days', 365))
+    except ValueError:
+        return JsonResponse({'error': "'window' and 'days' must be whole numbers."}, status=400)
+    if period not in PERIODS or not 1 <= window <= 52 or not 1 <= days <= 366 * 5:
+        return JsonResponse({'error': "Unsupported period, window or days."}, status=400)
+
+    return JsonResponse(user_analytics(request.user, period, window, days))
+
 ################################## User Profile Management #############################
 # Profile Management View
 @login_required
@@ -182,26 +298,44 @@ def delete_account(request):
 # Profile View for logged-in users
 @login_required
 def profile_view(request):
-    profile, created = Profile.objects.get_or_create(user=request.user)
-
-    if request.method == 'POST': # If the form has been submitted, create a form instance with the submitted data
+    profile = profile_for(request.user)
+    form, avatar_form = ProfileForm(instance=profile), AvatarForm()
+
+    if request.method == 'POST' and request.FILES: # Profile picture upload
+        avatar_form = AvatarForm(request.POST, request.FILES)
+        if avatar_form.is_valid():
+            try:
+                live = set_avatar(request.user, avatar_form.cleaned_data['picture'])
+            except ValueError as error: # Too big, or not an image
+                avatar_form.add_error('picture', str(error))
+            else:
+                return redirect('profile') if live else redirect(reverse('profile') + '?avatar=processing')
+    elif request.method == 'POST': # If the form has been submitted, create a form instance with the submitted data
         form = ProfileForm(request.POST, instance=profile)
         if form.is_valid():
-            form.save()
+            if form.has_changed(): # Resubmitting the same values doesn't write the row again
+                form.save()
             return redirect('profile')
-    else:
-        form = ProfileForm(instance=profile)
 
     return render(request, 'account/profile.html', {
         'profile_form': form,
+        'avatar_form': avatar_form,
+        'avatar': profile.avatar,
+        'avatar_processing': request.GET.get('avatar') == 'processing',
     })
 
 
 ########################### Group Management #######################################
+# Pack directory: alphabetical pages, optionally filtered by ?q= (name prefix or words in the name/description)
 @login_required
-def group_list(request): # List all groups and fetch
-    groups = Group.objects.all() 
-    return render(request, 'groups/group_list.html', {'groups': groups}) 
+@replica_reads
+def group_list(request):
+    query = request.GET.get('q', '').strip()
+    try:
+        groups, next_cursor = group_page(query, request.GET.get('cursor'), settings.GROUP_PAGE_SIZE)
+    except ValueError:
+        return HttpResponseBadRequest("Invalid cursor.")
+    return render(request, 'groups/group_list.html', {'groups': groups, 'query': query, 'next_cursor': next_cursor})
 
 # Create Group View
 @login_required
@@ -220,26 +354,68 @@ def group_create(request):
 @login_required
 def group_detail(request, group_id): # View group details and messages
     group = get_object_or_404(Group, id=group_id)
-    messages = Message.objects.filter(group=group).order_by('timestamp')
+    is_member = group.members.filter(pk=request.user.pk).exists() # One lookup on the membership index
 
     if request.method == 'POST': # If the form has been submitted, get message content
+        if not is_member: # Posts are pushed live to the pack, so only members may send them
+            return HttpResponseForbidden("Join this pack to howl in it.")
         content = request.POST.get('message') 
         if content:
-            Message.objects.create(group=group, user=request.user, content=content)
+            post_message(group.id, request.user, content) # Saves and pushes to connected pack members
             return redirect('group_detail', group_id=group.id)
 
+    messages, has_older = [], False
+    if is_member: # Only members see the chat, and only the latest messages are rendered
+        latest = Message.objects.filter(group=group).select_related('user__profile__avatar').order_by('-timestamp', '-id')
+        messages = list(latest[:settings.CHAT_HISTORY_LIMIT])[::-1]
+        # A full page may have more behind it; a short one only if older months were archived
+        has_older = len(messages) == settings.CHAT_HISTORY_LIMIT or MessageArchive.objects.filter(group=group).exists()
+
     return render(request, 'groups/group_detail.html', { # Render the group detail template
         'group': group,
-        'messages': messages
+        'is_member': is_member,
+        'messages': messages,
+        'has_older': has_older,
+    })
+
+# Incremental chat polling: messages after a given id (or timestamp), oldest first. ?before=<id> pages back through
+# older history instead, continuing into the monthly archives once the message table runs out
+@login_required
+def group_messages(request, group_id):
+    group = get_object_or_404(Group, id=group_id)
+    if not group.members.filter(pk=request.user.pk).exists():
+        return JsonResponse({'error': "Join this pack to read its messages."}, status=403)
+
+    messages = Message.objects.filter(group=group).select_related('user__profile__avatar').order_by('timestamp', 'id')
+    before = None
+    try:
+        if request.GET.get('before'):
+            before = int(request.GET['before'])
+        elif request.GET.get('after'):
+            messages = messages.filter(id__gt=int(request.GET['after']))
+        elif request.GET.get('since'):
+            since = parse_datetime(request.GET['since'])
+            if since is None:
+                raise ValueError
+            messages = messages.filter(timestamp__gt=since)
+    except ValueError:
+        return JsonResponse({'error': "Invalid 'after', 'since' or 'before' value."}, status=400)
+
+    limit = settings.CHAT_HISTORY_LIMIT
+    if before is not None:
+        page, has_more = messages_before(group.id, before, limit)
+    else:
+        page = list(messages[:limit + 1])
+        page, has_more = page[:limit], len(page) > limit
+    return JsonResponse({
+        'messages': [message_payload(msg, msg.user.username, user_thumbnail(msg.user)) for msg in page],
+        'has_more': has_more,
     })
 
 @login_required # Ensure the user is logged in to join a group
 def join_group(request, group_id):
     group = get_object_or_404(Group, id=group_id)
-    group.members.add(request.user)
-
-    ensure_badges_exist() # Ensure badges exist in the database
-    check_and_award_badges(request.user) # Check and award badges after joining a group
+    group.members.add(request.user) # The membership signal queues the badge progress update
 
     return redirect('group_detail', group_id=group.id)
 
@@ -249,6 +425,28 @@ def leave_group(request, group_id):
     group.members.remove(request.user)
     return redirect('group_list')
 
+# Top members of a pack, or of everyone without a group_id (?period=week|month|all&metric=calories|workouts|streak)
+@login_required
+@replica_reads
+def leaderboard(request, group_id=None):
+    group = get_object_or_404(Group, id=group_id) if group_id is not None else None
+    period = request.GET.get('period', 'week')
+    metric = request.GET.get('metric', 'calories')
+    if period not in LEADERBOARD_PERIODS or metric not in METRICS:
+        return HttpResponseBadRequest("Unsupported period or metric.")
+
+    my_rank, my_score = rank_of(request.user, period, metric, group)
+    return render(request, 'groups/leaderboard.html', {
+        'group': group,
+        'period': period,
+        'metric': metric,
+        'periods': LeaderboardEntry.PERIOD_CHOICES,
+        'metrics': [(key, label) for key, (_, label) in METRICS.items()],
+        'entries': top_entries(period, metric, group, settings.LEADERBOARD_SIZE),
+        'my_rank': my_rank,
+        'my_score': my_score,
+    })
+
 def group_main(request): # Main view for group management
     return render(request, 'groups/group_main.html')
 
@@ -262,13 +460,30 @@ def conservation_view(request): # Define grid rows and columns for the conservat
     grid_rows = [1, 2, 3] 
     grid_cols = [1, 2, 3]
     return render(request, 'pages/conservation.html', {
-        'grid_rows': grid_rows,
-        'grid_cols': grid_cols,
+        'wolf_images': [(f'images/wolves/wolf{i}{j}.jpg', f'Wolf {i}{j}') for i in grid_rows for j in grid_cols],
     })
 
 
+############################### Operations #######################################
+# Prometheus scrape endpoint for the instrumentation middleware
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    authorized = bool(token) and constant_time_compare(request.headers.get('Authorization', ''), f"Bearer {token}")
+    if not (request.user.is_staff or authorized):
+        return HttpResponseForbidden()
+    publish_queue_metrics() # Queue depth and latency come from the task table, not this process
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 ############################# Challenge and Badges Management ###############################
 @login_required
-def challenges_and_badges(request): 
-    user_badges = UserBadge.objects.filter(user=request.user) # Fetch badges for the logged-in user
-    return render(request, 'pages/challenges.html', {'user_badges': user_badges})
+@replica_reads
+def challenges_and_badges(request):
+    def build_badges(): # Fetch badges for the logged-in user
+        user_badges = UserBadge.objects.filter(user=request.user).select_related('badge')
+        return render_to_string('partials/badge_list.html', {'user_badges': user_badges})
+
+    badges_html = cached_for_user(request.user.id, 'challenges:badges', build_badges)
+    # Whether a streak is still current depends on today's date, so the day is part of the key
+    streaks = cached_for_user(request.user.id, f"challenges:streaks:{timezone.localdate()}", lambda: streak_summary(request.user.id))
+    return render(request, 'pages/challenges.html', {'badges_html': badges_html, 'streaks': streaks})